@@ -12,6 +12,9 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from app import create_app, db
 from app.models import Voter
+from app.importer import load_registry_keys, VoterIdAllocator, TokenAllocator
+from app.voter_ids import VoterNumberSequence
+from app.search import invalidate_voter_search
 
 def add_emergency_voters():
     """Add voters directly to database for presentation"""
@@ -25,6 +28,7 @@ def add_emergency_voters():
             existing_count = Voter.query.count()
             if existing_count > 0:
                 Voter.query.delete()
+                VoterNumberSequence().reset()
                 print(f"Cleared {existing_count} existing voters")
 
             # Add presentation voters (without phone_number for compatibility)
@@ -39,24 +43,26 @@ def add_emergency_voters():
                 ('OBUSLG008', 'Jennifer Anderson'),
             ]
 
+            # Allocate credentials in memory against what is left in the registry
+            _, voter_ids, tokens = load_registry_keys()
+            id_allocator = VoterIdAllocator(voter_ids, sequence=VoterNumberSequence())
+            new_tokens = TokenAllocator(tokens).allocate_many(len(presentation_voters))
+
             added_count = 0
-            for member_id, full_name in presentation_voters:
+            for (member_id, full_name), voting_token in zip(presentation_voters, new_tokens):
                 voter = Voter(
                     member_id=member_id,
                     full_name=full_name,
-                    voter_id=member_id,  # Use MemberID as VoterID
-                    voting_token='12345678'  # Simple token for presentation
+                    voter_id=id_allocator.allocate(member_id),  # MemberID as VoterID when free
+                    voting_token=voting_token
                 )
 
-                # Generate credentials
-                voter.generate_voter_id()
-                voter.generate_voting_token()
-
                 db.session.add(voter)
                 added_count += 1
                 print(f"Added: {member_id} - {full_name}")
 
             db.session.commit()
+            invalidate_voter_search()
             print(f"\nSuccessfully added {added_count} voters to database!")
 
             # Show voters for presentation
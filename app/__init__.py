@@ -17,6 +17,28 @@ def create_app():
     app.config['ELECTION_TITLE'] = os.environ.get('ELECTION_TITLE', 'General Election')
     app.config['ADMIN_TOKEN'] = os.environ.get('ADMIN_TOKEN', 'admin-token')
 
+    # Vote attempt rate limiting: 'sqlite' is shared by all workers on the node, 'memory' is per-process
+    app.config['RATE_LIMIT_BACKEND'] = os.environ.get('RATE_LIMIT_BACKEND', 'sqlite')
+    app.config['RATE_LIMIT_ATTEMPTS'] = int(os.environ.get('RATE_LIMIT_ATTEMPTS', 10))
+    app.config['RATE_LIMIT_WINDOW'] = int(os.environ.get('RATE_LIMIT_WINDOW', 300))
+    app.config['RATE_LIMIT_MAX_KEYS'] = int(os.environ.get('RATE_LIMIT_MAX_KEYS', 65536))
+
+    # Optional write-behind ballot journal (POSIX only) for absorbing the opening surge
+    app.config['BALLOT_JOURNAL'] = os.environ.get('BALLOT_JOURNAL') == '1'
+    app.config['BALLOT_JOURNAL_DIR'] = os.environ.get('BALLOT_JOURNAL_DIR')
+    app.config['BALLOT_JOURNAL_FLUSH_INTERVAL'] = float(os.environ.get('BALLOT_JOURNAL_FLUSH_INTERVAL', 0.5))
+
+    # Open SSE streams per worker; each holds a gthread thread, so keep it well below --threads
+    # (pages turned away poll the ETag endpoints instead)
+    app.config['LIVE_MAX_STREAMS'] = int(os.environ.get(
+        'LIVE_MAX_STREAMS', int(os.environ.get('GUNICORN_THREADS', 50)) // 2))
+
+    # Voter CSV imports are committed in chunks of this many rows
+    app.config['IMPORT_COMMIT_ROWS'] = int(os.environ.get('IMPORT_COMMIT_ROWS', 5000))
+    # Uploads are imported by a per-worker thread pool of this size (0 = inside the upload request)
+    app.config['IMPORT_WORKERS'] = int(os.environ.get('IMPORT_WORKERS', 2))
+    app.config['IMPORT_DIR'] = os.environ.get('IMPORT_DIR')
+
     # Database configuration - prioritize PostgreSQL for production
     database_url = os.environ.get('DATABASE_URL')
 
@@ -152,6 +174,56 @@ def create_app():
             print(f'Warning: failed to create positions: {e}')
             import traceback
             traceback.print_exc()
+
+        # Add indexes declared on the models to tables created by older versions
+        try:
+            from app.migrations import apply_index_migration
+
+            created, _ = apply_index_migration()
+            if created:
+                print(f'Created indexes: {", ".join(created)}')
+        except Exception as e:
+            print(f'Warning: failed to apply index migration: {e}')
+
+        # Backfill per-candidate tallies for databases that predate the tally table
+        try:
+            from app.tally import backfill_tallies_if_needed
+
+            rebuilt = backfill_tallies_if_needed()
+            if rebuilt:
+                print(f'Rebuilt vote tallies for {rebuilt} candidates')
+        except Exception as e:
+            db.session.rollback()
+            print(f'Warning: failed to backfill vote tallies: {e}')
+
+        # Backfill the per-minute turnout rollup for databases that predate it
+        try:
+            from app.turnout import backfill_turnout_if_needed
+
+            rebuilt = backfill_turnout_if_needed()
+            if rebuilt:
+                print(f'Rebuilt turnout rollup for {rebuilt} minutes')
+        except Exception as e:
+            db.session.rollback()
+            print(f'Warning: failed to backfill turnout rollup: {e}')
+
+        # Create the OBUSLG voter ID counter and move it past IDs already in use
+        try:
+            from app.voter_ids import sync_voter_number_counter
+
+            sync_voter_number_counter()
+        except Exception as e:
+            db.session.rollback()
+            print(f'Warning: failed to sync voter ID counter: {e}')
+
+        # Replay ballots a crashed worker journaled but never flushed
+        if app.config['BALLOT_JOURNAL']:
+            try:
+                from app.journal import init_journal
+
+                init_journal(app)
+            except Exception as e:
+                print(f'Warning: ballot journal disabled: {e}')
     # Additional initialization for SQLite (if needed)
     try:
         if app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite:'):
@@ -0,0 +1,168 @@
+"""Immutable, per-worker snapshot of the ballot.
+
+The vote page and the vote POST only need the votable positions, their
+candidates and a candidate -> position map. The snapshot is built with one
+query and cached on the app until candidate CRUD, position toggles or
+position creation bump the ``ballot`` version counter, so rendering and
+validating a ballot cost no queries at all.
+"""
+from collections import namedtuple
+from dataclasses import dataclass
+from datetime import datetime
+from types import MappingProxyType
+from typing import Mapping, Tuple
+
+from flask import current_app
+from sqlalchemy import or_
+
+from . import db, versions
+from .models import Candidate, Position, Vote, Voter
+from .results import bump_results_version
+from .tally import increment_tallies
+from .turnout import record_turnout
+
+VERSION_NAME = 'ballot'
+
+BallotCandidate = namedtuple('BallotCandidate', 'id name bio photo_url position_id')
+BallotPosition = namedtuple('BallotPosition', 'id name description candidates')
+
+
+@dataclass(frozen=True)
+class BallotSnapshot:
+    positions: Tuple[BallotPosition, ...]
+    candidate_positions: Mapping[int, int]
+    version: int
+
+    def selections(self, form):
+        """Return ``[(position_id, candidate_id), ...]`` for valid choices in ``form``."""
+        chosen = []
+        for position in self.positions:
+            raw = form.get(f'position_{position.id}')
+            if not raw:
+                continue
+            try:
+                candidate_id = int(raw)
+            except (TypeError, ValueError):
+                continue
+            if self.candidate_positions.get(candidate_id) == position.id:
+                chosen.append((position.id, candidate_id))
+        return chosen
+
+
+def _build(version):
+    rows = db.session.execute(
+        db.select(Position.id, Position.name, Position.description,
+                  Candidate.id, Candidate.name, Candidate.bio, Candidate.photo_url)
+        .join(Candidate, Candidate.position_id == Position.id)
+        .where(Position.is_voting_enabled)
+        .order_by(Position.id, Candidate.id)
+    )
+
+    positions = []
+    candidate_positions = {}
+    for position_id, name, description, candidate_id, candidate_name, bio, photo_url in rows:
+        if not positions or positions[-1][0] != position_id:
+            positions.append((position_id, name, description, []))
+        positions[-1][3].append(BallotCandidate(candidate_id, candidate_name, bio, photo_url, position_id))
+        candidate_positions[candidate_id] = position_id
+
+    return BallotSnapshot(
+        positions=tuple(BallotPosition(pid, name, desc, tuple(cands)) for pid, name, desc, cands in positions),
+        candidate_positions=MappingProxyType(candidate_positions),
+        version=version,
+    )
+
+
+def get_ballot():
+    """Return the cached :class:`BallotSnapshot`, rebuilding it if the ballot changed."""
+    cache = current_app.extensions.setdefault('ballot_cache', {})
+    version = versions.current(VERSION_NAME)
+    snapshot = cache.get('snapshot')
+    if snapshot is None or snapshot.version != version:
+        snapshot = _build(version)
+        cache['snapshot'] = snapshot
+    return snapshot
+
+
+def invalidate_ballot():
+    """Force every worker to rebuild the ballot on its next request."""
+    current_app.extensions.setdefault('ballot_cache', {}).pop('snapshot', None)
+    versions.bump(VERSION_NAME)
+
+
+def claim_voter(voter_id):
+    """Atomically flip ``has_voted`` for ``voter_id``; return True if this call won.
+
+    ``UPDATE ... WHERE has_voted is false`` is a compare-and-set: only one of
+    several concurrent submissions for the same voter can match the row, and
+    voters never wait on each other's rows.
+    """
+    result = db.session.execute(
+        db.update(Voter)
+        .where(Voter.id == voter_id)
+        .where(or_(Voter.has_voted == False, Voter.has_voted.is_(None)))  # noqa: E712
+        .values(has_voted=True)
+    )
+    return result.rowcount == 1
+
+
+def record_ballot(voter, selections, ip_address=None, user_agent=None):
+    """Claim the voter and persist a validated ballot in one short transaction.
+
+    The claim gates everything else: if another submission already claimed
+    this voter the transaction is rolled back and False is returned. Otherwise
+    all selections go in as a single multi-row ``INSERT`` (executemany) with
+    the tally and turnout-rollup bumps, then one commit. The rollup upsert
+    goes last, so the ``turnout_minute`` row every ballot of that minute
+    shares is held only for the commit itself; ballots for the same
+    candidate already queue the same way on its tally row.
+
+    With the write-behind journal enabled the ballot is fsynced to the
+    journal first, with no database lock held, and only the claim is
+    committed here; the flusher inserts the ballot once the claim is
+    settled. A claim that loses or fails to commit marks the journal entry
+    aborted, so a retried submission's ballot is the one applied.
+    """
+    journal = current_app.extensions.get('ballot_journal')
+    entry = None
+    if journal is not None:
+        try:
+            entry = journal.append(voter.id, selections, ip_address, user_agent)
+        except Exception as e:
+            # Fall back to a synchronous write in the same transaction as the claim
+            print(f"Ballot journal append failed, writing synchronously: {e}")
+
+    if entry is not None:
+        committed = False
+        try:
+            if not claim_voter(voter.id):
+                db.session.rollback()
+                return False
+            db.session.commit()
+            committed = True
+        finally:
+            journal.finish(entry, committed)
+        bump_results_version()  # turnout changed
+        return True
+
+    if not claim_voter(voter.id):
+        db.session.rollback()
+        return False
+
+    timestamp = datetime.utcnow()
+    db.session.execute(db.insert(Vote), [
+        {
+            'voter_id': voter.id,
+            'candidate_id': candidate_id,
+            'position_id': position_id,
+            'ip_address': ip_address,
+            'user_agent': user_agent,
+            'timestamp': timestamp,
+        }
+        for position_id, candidate_id in selections
+    ])
+    increment_tallies(candidate_id for _, candidate_id in selections)
+    record_turnout(timestamp)
+    db.session.commit()
+    bump_results_version()
+    return True
@@ -0,0 +1,72 @@
+"""In-memory cache of rendered template fragments.
+
+Fragments are keyed by everything that can change their output (for the
+dashboard: the results version plus organization name and election title),
+so entries never need invalidating - a new version simply becomes a new key.
+Regeneration is single-flight: when a key is missing, one thread renders it
+while concurrent requests for the same key wait and reuse the result, so a
+version bump during a traffic spike costs one render per worker.
+"""
+import threading
+from collections import OrderedDict
+
+
+class FragmentCache:
+    def __init__(self, max_entries=16):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get_or_render(self, key, render):
+        """Return the cached fragment for ``key``, calling ``render()`` at most once per key."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            flight = self._flights.setdefault(key, threading.Lock())
+
+        with flight:
+            with self._lock:
+                if key in self._entries:
+                    # Rendered by the thread we were waiting on
+                    self.coalesced += 1
+                    return self._entries[key]
+                self.misses += 1
+
+            try:
+                html = render()
+            except Exception:
+                with self._lock:
+                    self._flights.pop(key, None)
+                raise
+
+            with self._lock:
+                self._entries[key] = html
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                self._flights.pop(key, None)
+            return html
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'hit_ratio': round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+                'entries': len(self._entries),
+            }
+
+
+def get_fragment_cache(app):
+    """Return the per-worker fragment cache for ``app``."""
+    cache = app.extensions.get('fragment_cache')
+    if cache is None:
+        cache = app.extensions.setdefault('fragment_cache', FragmentCache())
+    return cache
@@ -0,0 +1,247 @@
+"""Background voter imports.
+
+The upload route spools the CSV to disk, records an
+:class:`~app.models.ImportJob` and hands the import to a small per-worker
+thread pool, answering ``202`` straight away instead of holding the
+request open for the whole file. The job's counters are written to its row
+after every committed chunk, so whichever worker serves
+``/admin/import-jobs/<id>`` sees the progress of an import running in
+another one.
+
+``IMPORT_WORKERS`` sets the pool size; ``0`` runs the import inside the
+upload request. A running job whose row has not been updated for
+``STALE_AFTER`` died with its worker process and is reported as
+``interrupted``; the chunks it committed are kept.
+
+Every rejected, skipped or corrected row is written to a CSV report next
+to the spooled upload, downloadable from ``/admin/import-jobs/<id>/report``
+for ``REPORT_MAX_AGE``. A dry-run job runs the same single pass of checks
+against the preloaded registry sets and writes only the report, so a file
+can be fixed from one complete list of problems before importing it.
+An upsert job also updates the name and phone number of members who are
+already registered instead of skipping them.
+"""
+import csv
+import json
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app, url_for
+
+from . import db
+from .importer import VoterImporter, summary_message
+from .models import ImportJob
+from .results import bump_results_version
+from .search import voters_imported, invalidate_voter_search
+
+STALE_AFTER = timedelta(minutes=10)
+REPORT_MAX_AGE = timedelta(days=7)
+REPORT_HEADER = ['Row', 'Status', 'Message']
+REQUIRED_COLUMNS = 3  # MemberID, FullName, Phone
+# Error messages kept on the job row; error_count and the CSV report cover every one
+JOB_MAX_ERRORS = 50000
+
+_executor_lock = threading.Lock()
+
+
+def _import_dir():
+    return current_app.config.get('IMPORT_DIR') or os.path.join(current_app.instance_path, 'imports')
+
+
+def report_path(job_id):
+    """Where the row report of job ``job_id`` is written."""
+    return os.path.join(_import_dir(), f'{job_id}-report.csv')
+
+
+def _prune_reports(directory):
+    cutoff = (datetime.utcnow() - REPORT_MAX_AGE).timestamp()
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        try:
+            if name.endswith('-report.csv') and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def get_import_executor(app):
+    """Return this worker's import thread pool, creating it on first use."""
+    executor = app.extensions.get('import_executor')
+    if executor is None:
+        with _executor_lock:
+            executor = app.extensions.get('import_executor')
+            if executor is None:
+                executor = ThreadPoolExecutor(max_workers=app.config['IMPORT_WORKERS'],
+                                              thread_name_prefix='voter-import')
+                app.extensions['import_executor'] = executor
+    return executor
+
+
+def start_import_job(file, dry_run=False, upsert=False):
+    """Spool an uploaded CSV to disk, record a job for it and start importing; returns the job ID."""
+    job_id = uuid.uuid4().hex
+    directory = _import_dir()
+    os.makedirs(directory, exist_ok=True)
+    _prune_reports(directory)
+    path = os.path.join(directory, f'{job_id}.csv')
+    file.save(path)
+    try:
+        db.session.add(ImportJob(id=job_id, filename=(file.filename or '')[:255], status='queued',
+                                 dry_run=dry_run, upsert=upsert, updated_at=datetime.utcnow()))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        os.remove(path)
+        raise
+
+    app = current_app._get_current_object()
+    if app.config['IMPORT_WORKERS'] > 0:
+        get_import_executor(app).submit(_run_job, app, job_id, path)
+    else:
+        _run_job(app, job_id, path)
+    return job_id
+
+
+def _run_job(app, job_id, path):
+    with app.app_context():
+        try:
+            run_import_job(job_id, path)
+        except Exception as e:
+            print(f"Import job {job_id} crashed: {e}")
+            import traceback
+            traceback.print_exc()
+        finally:
+            db.session.remove()
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _update_job(job_id, **values):
+    db.session.execute(
+        db.update(ImportJob).where(ImportJob.id == job_id).values(updated_at=datetime.utcnow(), **values)
+    )
+    db.session.commit()
+
+
+def _progress(importer):
+    return {
+        'rows_read': importer.rows_read,
+        'added': importer.added if importer.dry_run else importer.committed,
+        'updated': importer.updated,
+        'unchanged': importer.unchanged,
+        'skipped': importer.skipped,
+        'invalid': importer.invalid,
+        'error_count': importer.error_count,
+    }
+
+
+def run_import_job(job_id, path):
+    """Import (or with a dry-run job, only check) the spooled CSV at ``path``.
+
+    Progress is recorded on job ``job_id`` and every problem row goes to its report.
+    """
+    job = db.session.get(ImportJob, job_id)
+    dry_run, upsert = job.dry_run, job.upsert
+    _update_job(job_id, status='running', started_at=datetime.utcnow())
+    importer = None
+    status, error = 'completed', None
+    try:
+        with open(path, encoding='utf-8-sig', newline='') as f, \
+                open(report_path(job_id), 'w', encoding='utf-8', newline='') as report_file:
+            report = csv.writer(report_file)
+            report.writerow(REPORT_HEADER)
+            rows = csv.reader(f)
+            header = next(rows, None)
+            if header is None:
+                status, error = 'failed', 'CSV file is empty'
+            elif len(header) < REQUIRED_COLUMNS:
+                status = 'failed'
+                error = f'CSV header has {len(header)} columns; expected MemberID, FullName, Phone[, VotingToken]'
+                report.writerow([1, 'invalid', error])
+            else:
+                print(f"CSV Header: {header}")
+                importer = VoterImporter(commit_every=current_app.config['IMPORT_COMMIT_ROWS'],
+                                         on_progress=lambda imp: _update_job(job_id, **_progress(imp)),
+                                         max_errors=JOB_MAX_ERRORS, dry_run=dry_run, report=report,
+                                         upsert=upsert)
+                importer.import_rows(rows)
+    except UnicodeDecodeError:
+        db.session.rollback()
+        saved = importer.committed if importer else 0
+        status = 'failed'
+        error = (f'File encoding error after row {importer.rows_read + 1 if importer else 1}. '
+                 f'Please save your CSV file as UTF-8.')
+        if not dry_run:
+            error += f' {saved} voters before that point were saved.'
+    except Exception as e:
+        db.session.rollback()
+        print(f"Import job {job_id} database error: {e}")
+        import traceback
+        traceback.print_exc()
+        status, error = 'failed', f'Database error during save: {str(e)}'
+
+    values = {'status': status, 'error': error, 'finished_at': datetime.utcnow(),
+              'errors': json.dumps(importer.errors if importer else [])}
+    if importer is not None:
+        values.update(_progress(importer))
+    _update_job(job_id, **values)
+
+    if importer is not None and importer.committed:
+        bump_results_version()  # turnout denominator changed
+    if importer is not None and importer.updated and not dry_run:
+        invalidate_voter_search()  # names and phone numbers changed
+    elif importer is not None and importer.committed:
+        voters_imported()
+    print(f"Import job {job_id} {status}{' (dry run)' if dry_run else ''}: {values.get('added', 0)} added, "
+          f"{values.get('skipped', 0)} skipped, {values.get('invalid', 0)} invalid")
+
+
+def _iso(value):
+    return value.isoformat() + 'Z' if value else None
+
+
+def job_to_dict(job):
+    now = datetime.utcnow()
+    status = job.status
+    if status == 'running' and job.updated_at and now - job.updated_at > STALE_AFTER:
+        status = 'interrupted'
+
+    elapsed = ((job.finished_at or now) - job.started_at).total_seconds() if job.started_at else 0.0
+    errors = json.loads(job.errors) if job.errors else []
+    data = {
+        'job_id': job.id,
+        'filename': job.filename,
+        'status': status,
+        'dry_run': job.dry_run,
+        'mode': 'upsert' if job.upsert else 'insert',
+        'rows_read': job.rows_read,
+        'added': job.added,
+        'skipped': job.skipped,
+        'invalid': job.invalid,
+        'rows_per_second': round(job.rows_read / elapsed, 1) if elapsed > 0 else 0.0,
+        'elapsed_seconds': round(elapsed, 3),
+        'error_count': job.error_count,
+        'errors': errors,
+        'errors_truncated': job.finished_at is not None and job.error_count > len(errors),
+        'created_at': _iso(job.created_at),
+        'started_at': _iso(job.started_at),
+        'finished_at': _iso(job.finished_at),
+    }
+    if job.upsert:
+        data['updated'] = job.updated
+        data['unchanged'] = job.unchanged
+    if job.finished_at is not None:
+        data['report_url'] = url_for('admin.import_job_report', job_id=job.id)
+    if status == 'completed':
+        data['message'] = summary_message(job.added, job.skipped, job.invalid, job.dry_run,
+                                          *((job.updated, job.unchanged) if job.upsert else ()))
+    elif job.error:
+        data['error'] = job.error
+    elif status == 'interrupted':
+        data['error'] = f'Import stopped after {job.rows_read} rows; {job.added} voters were saved'
+    return data
@@ -0,0 +1,400 @@
+"""Set-based bulk voter import.
+
+The per-row path ran a duplicate check, a scan of every ``OBUSLG`` voter
+ID and a query per random token attempt for each CSV row - O(n²) round
+trips for a large file. :class:`VoterImporter` instead loads the existing
+member IDs, voter IDs and tokens into sets with one query, validates rows
+and allocates tokens in memory, reserves fallback ``OBUSLG`` numbers from
+the shared counter (:mod:`app.voter_ids`) a chunk at a time, and writes the
+accepted rows with chunked multi-row ``INSERT``s.
+
+Rows are consumed one at a time from any iterable (the upload route feeds
+it a ``csv.reader`` over the request stream), and with ``commit_every``
+each chunk of that many rows is committed as soon as it is written. Memory use is then
+bounded by the registry's key sets rather than the file size, and a bad
+chunk or a decoding error late in a file loses only the uncommitted rows.
+"""
+import secrets
+from array import array
+from datetime import datetime
+
+from . import db
+from .models import Voter
+from .upsert import upsert_insert
+from .voter_ids import VoterNumberSequence, format_voter_id, obuslg_number
+
+VOTER_ID_MAX_LENGTH = Voter.__table__.c.voter_id.type.length
+INSERT_CHUNK_SIZE = 1000
+MAX_ERRORS = 1000
+TOKEN_SPACE = 10 ** 8
+# Largest multiple of TOKEN_SPACE that fits in 32 bits; higher draws are
+# rejected so that every token is equally likely
+_TOKEN_DRAW_LIMIT = (2 ** 32 // TOKEN_SPACE) * TOKEN_SPACE
+
+
+def load_registry_keys():
+    """Return ``(member_ids, voter_ids, tokens)`` sets for every registered voter."""
+    member_ids, voter_ids, tokens = set(), set(), set()
+    for member_id, voter_id, token in db.session.execute(
+            db.select(Voter.member_id, Voter.voter_id, Voter.voting_token)):
+        member_ids.add(member_id)
+        voter_ids.add(voter_id)
+        tokens.add(token)
+    return member_ids, voter_ids, tokens
+
+
+def load_registry_credentials():
+    """Return ``{member_id: (voter_id, voting_token)}`` for every registered voter."""
+    return {member_id: (voter_id, token) for member_id, voter_id, token in db.session.execute(
+        db.select(Voter.member_id, Voter.voter_id, Voter.voting_token))}
+
+
+def summary_message(added, skipped, invalid, dry_run=False, updated=None, unchanged=None):
+    if dry_run:
+        message = f'Dry run: {added} voters would be added'
+        if updated is not None:
+            message += f' and {updated} registered voters checked for changes'
+        message += ', nothing was saved'
+    elif updated is not None:
+        message = f'{added} voters added, {updated} updated and {unchanged} unchanged'
+    else:
+        message = f'{added} voters uploaded successfully with Voter IDs generated'
+    if skipped > 0:
+        message += f' ({skipped} duplicates skipped)'
+    if invalid > 0:
+        message += f' ({invalid} invalid rows skipped)'
+    return message
+
+
+class VoterIdAllocator:
+    """Voter IDs for a batch, checked against an in-memory set of taken IDs.
+
+    The member ID is reused as the voter ID when free; otherwise an
+    ``OBUSLG`` number is reserved from ``sequence`` (see
+    :mod:`app.voter_ids`), skipping numbers that are already taken. Without
+    a sequence, numbering continues after the highest ``OBUSLG`` ID in
+    ``taken``, which is only safe when nothing else is allocating.
+    """
+
+    def __init__(self, taken, sequence=None):
+        self.taken = taken
+        self.sequence = sequence
+        numbers = (obuslg_number(voter_id) for voter_id in taken)
+        self.highest = max((n for n in numbers if n is not None), default=0)
+
+    def _take(self, voter_id):
+        self.taken.add(voter_id)
+        number = obuslg_number(voter_id)
+        if number is not None and number > self.highest:
+            self.highest = number
+
+    def claim(self, member_id):
+        """Reuse ``member_id`` as the voter ID if it is free; returns it, or None."""
+        if member_id and len(member_id) <= VOTER_ID_MAX_LENGTH and member_id not in self.taken:
+            self._take(member_id)
+            return member_id
+        return None
+
+    def allocate_many(self, count):
+        """Return ``count`` new ``OBUSLG`` voter IDs, reserved as one block."""
+        voter_ids = []
+        while len(voter_ids) < count:
+            needed = count - len(voter_ids)
+            if self.sequence is None:
+                numbers = range(self.highest + 1, self.highest + 1 + needed)
+            else:
+                numbers = self.sequence.reserve(needed)
+            collided = False
+            for number in numbers:
+                voter_id = format_voter_id(number)
+                if voter_id in self.taken:
+                    collided = True
+                    continue
+                self._take(voter_id)
+                voter_ids.append(voter_id)
+            if collided and self.sequence is not None:
+                # The counter is behind IDs that were set directly; jump past all of them.
+                # Without a sequence there is no counter to move; numbering just goes on past them
+                self.sequence.advance(self.highest)
+        return voter_ids
+
+    def allocate(self, member_id=None):
+        return self.claim(member_id) or self.allocate_many(1)[0]
+
+
+class TokenAllocator:
+    """Unique, unpredictable 8-digit voting tokens checked against an in-memory set.
+
+    The taken tokens are loaded once (see :func:`load_registry_keys`), so a
+    collision costs a set lookup rather than a query per attempt.
+    """
+
+    def __init__(self, taken):
+        self.taken = taken
+
+    def claim(self, token):
+        """Reserve a supplied token; False if it is already in use."""
+        if token in self.taken:
+            return False
+        self.taken.add(token)
+        return True
+
+    def allocate(self):
+        while True:
+            token = f'{secrets.randbelow(TOKEN_SPACE):08d}'
+            if self.claim(token):
+                return token
+
+    def allocate_many(self, count):
+        """Return ``count`` new tokens, drawn from the OS CSPRNG in bulk."""
+        if len(self.taken) + count > TOKEN_SPACE:
+            raise ValueError(f'Only {TOKEN_SPACE - len(self.taken)} voting tokens are still unused')
+        tokens = []
+        while len(tokens) < count:
+            # A little over what is still needed, to cover rejected draws and collisions
+            for value in array('I', secrets.token_bytes(4 * (count - len(tokens) + 16))):
+                if value >= _TOKEN_DRAW_LIMIT:
+                    continue
+                token = f'{value % TOKEN_SPACE:08d}'
+                if self.claim(token):
+                    tokens.append(token)
+                    if len(tokens) == count:
+                        break
+        return tokens
+
+
+class VoterImporter:
+    """Validate CSV rows and bulk-insert the new voters.
+
+    Rows are ``MemberID, FullName, Phone[, VotingToken]``. Member IDs
+    repeated within the file are skipped, as are registered ones unless
+    ``upsert`` is set: then their name and phone number are updated with
+    ``INSERT ... ON CONFLICT (member_id) DO UPDATE`` in the same chunked
+    statements as the new voters, and ``added``, ``updated`` and
+    ``unchanged`` count the outcome. Voter IDs and tokens are never changed.
+
+    With ``commit_every`` set, rows are inserted and committed in chunks of
+    that many, and a chunk that fails to insert is rolled back and reported
+    without stopping the import. Otherwise the caller commits.
+    ``on_progress(importer)`` is called after every flush. The first
+    ``max_errors`` error messages are kept; ``error_count`` counts them all,
+    and ``report`` (a ``csv.writer``) receives a ``[row, status, message]``
+    line for every rejected, skipped or corrected row.
+
+    With ``dry_run`` the same checks run against the preloaded sets but
+    nothing is written: ``added`` counts the voters that would be added
+    (and ``updated`` the registered ones an upsert would check), and no
+    voter IDs or tokens are generated.
+    """
+
+    def __init__(self, chunk_size=INSERT_CHUNK_SIZE, commit_every=None, on_progress=None,
+                 max_errors=MAX_ERRORS, dry_run=False, report=None, upsert=False):
+        self.upsert_insert = upsert_insert() if upsert else None
+        if upsert and self.upsert_insert is None:
+            raise ValueError('Upsert imports need a PostgreSQL or SQLite database')
+        if upsert:
+            # Registered voters keep their voter ID and token; the INSERT half needs them as values
+            self.registered = load_registry_credentials()
+            member_ids = set(self.registered)
+            voter_ids = {voter_id for voter_id, _ in self.registered.values()}
+            tokens = {token for _, token in self.registered.values()}
+        else:
+            member_ids, voter_ids, tokens = load_registry_keys()
+        self.chunk_size = commit_every or chunk_size
+        self.commit_every = commit_every
+        self.on_progress = on_progress
+        self.max_errors = max_errors
+        self.dry_run = dry_run
+        self.upsert = upsert
+        self.report = report
+        self.member_ids = member_ids  # already registered
+        self.file_member_ids = set()  # seen earlier in this file
+        self.voter_ids = VoterIdAllocator(voter_ids, sequence=VoterNumberSequence())
+        self.tokens = TokenAllocator(tokens)
+        self.pending = []
+        self.pending_rows = []
+        self.rows_read = 0
+        self.added = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.committed = 0
+        self.skipped = 0
+        self.invalid = 0
+        self.error_count = 0
+        self.errors = []
+
+    def _report(self, row, status, message):
+        if self.report is not None:
+            self.report.writerow([row, status, message])
+
+    def _error(self, row, message, status='invalid', rows=1):
+        """Record a problem with ``row`` (a row number or a ``first-last`` range).
+
+        Rows with status ``warning`` are still imported; anything else counts as invalid.
+        """
+        text = f"{'Rows' if rows > 1 else 'Row'} {row}: {message}"
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append(text)
+        print(text)
+        self._report(row, status, message)
+        if status != 'warning':
+            self.invalid += rows
+
+    def _skip(self, row, message):
+        print(f"Row {row}: Skipping {message}")
+        self._report(row, 'skipped', message)
+        self.skipped += 1
+
+    def add_row(self, row_num, row):
+        """Validate one CSV row and queue it for insertion."""
+        self.rows_read += 1
+        if not any(cell.strip() for cell in row):
+            return  # blank line
+
+        member_id = row[0].strip() if len(row) > 0 else ""
+        full_name = row[1].strip() if len(row) > 1 else ""
+        phone_number = row[2].strip() if len(row) > 2 else ""
+
+        # Validate required data
+        if not member_id or not full_name or not phone_number:
+            self._error(row_num, "Missing required data (MemberID, FullName, or Phone)")
+            return
+
+        # Basic phone number validation (should contain digits)
+        if not any(char.isdigit() for char in phone_number):
+            self._error(row_num, f"Invalid phone number (no digits): {phone_number}")
+            return
+
+        if member_id in self.file_member_ids:
+            self._skip(row_num, f"duplicate member ID (repeated in file): {member_id}")
+            return
+        if member_id in self.member_ids:
+            if not self.upsert:
+                self._skip(row_num, f"duplicate member ID (already registered): {member_id}")
+                return
+            voter_id, voting_token = self.registered[member_id]
+            self.file_member_ids.add(member_id)
+            self._queue(row_num, {
+                'member_id': member_id,
+                'full_name': full_name,
+                'phone_number': phone_number,
+                'voter_id': voter_id,
+                'voting_token': voting_token,
+            })
+            return
+
+        # Use the voting token from the CSV if it is valid and free, otherwise generate one
+        voting_token = None
+        if len(row) >= 4 and row[3].strip():
+            provided_token = row[3].strip()
+            if not (provided_token.isdigit() and len(provided_token) == 8):
+                self._error(row_num, f"Invalid voting token format for {member_id}, generating new one",
+                            status='warning')
+            elif not self.tokens.claim(provided_token):
+                self._error(row_num, f"Voting token already in use for {member_id}, generating new one",
+                            status='warning')
+            else:
+                voting_token = provided_token
+
+        self.file_member_ids.add(member_id)
+        self._queue(row_num, {
+            'member_id': member_id,
+            'full_name': full_name,
+            'phone_number': phone_number,
+            'voter_id': self.voter_ids.claim(member_id),
+            'voting_token': voting_token,  # fallback voter IDs and tokens are allocated per chunk in flush()
+        })
+
+    def _queue(self, row_num, voter):
+        self.pending.append(voter)
+        self.pending_rows.append(row_num)
+        if len(self.pending) >= self.chunk_size:
+            self.flush()
+
+    def _write_chunk(self):
+        """Insert (or upsert) the pending rows; returns ``(added, updated, unchanged)``."""
+        if not self.upsert:
+            db.session.execute(db.insert(Voter), self.pending)
+            return len(self.pending), 0, 0
+
+        # Counted from what the statement did, not from the preloaded registry:
+        # every row of the chunk carries the same created_at, which the update
+        # half leaves alone, so a returned row with that value was inserted
+        created_at = datetime.utcnow()
+        stmt = self.upsert_insert(Voter)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Voter.member_id],
+            set_={'full_name': stmt.excluded.full_name, 'phone_number': stmt.excluded.phone_number},
+            # Identical rows are left alone, so they are not returned below
+            where=db.or_(Voter.full_name != stmt.excluded.full_name,
+                         Voter.phone_number != stmt.excluded.phone_number),
+        ).returning(Voter.created_at)
+        written = db.session.execute(stmt, [dict(voter, created_at=created_at) for voter in self.pending]).scalars().all()
+        added = sum(1 for value in written if value == created_at)
+        updated = len(written) - added
+        return added, updated, len(self.pending) - len(written)
+
+    def flush(self):
+        """Insert the queued rows with one multi-row ``INSERT``, committing them if committing per chunk."""
+        if self.pending and self.dry_run:
+            existing = sum(1 for voter in self.pending if voter['member_id'] in self.member_ids)
+            self.added += len(self.pending) - existing
+            self.updated += existing
+            self.pending = []
+            self.pending_rows = []
+        elif self.pending:
+            first, last = self.pending_rows[0], self.pending_rows[-1]
+            needs_token = [voter for voter in self.pending if voter['voting_token'] is None]
+            for voter, token in zip(needs_token, self.tokens.allocate_many(len(needs_token))):
+                voter['voting_token'] = token
+            try:
+                needs_id = [voter for voter in self.pending if voter['voter_id'] is None]
+                for voter, voter_id in zip(needs_id, self.voter_ids.allocate_many(len(needs_id))):
+                    voter['voter_id'] = voter_id
+                added, updated, unchanged = self._write_chunk()
+                if self.commit_every is not None:
+                    db.session.commit()
+                    self.committed += added
+                self.added += added
+                self.updated += updated
+                self.unchanged += unchanged
+            except Exception as e:
+                if self.commit_every is None:
+                    raise
+                # Only this chunk is lost; earlier chunks are already committed
+                db.session.rollback()
+                self._error(first if first == last else f"{first}-{last}", f"database error, {len(self.pending)} rows not saved: {e}",
+                            status='not saved', rows=len(self.pending))
+            self.pending = []
+            self.pending_rows = []
+            if self.commit_every is not None:
+                print(f"Import progress: {self.rows_read} rows read, {self.committed} voters committed")
+        if self.on_progress is not None:
+            self.on_progress(self)
+
+    def import_rows(self, rows, start=2):
+        """Add every row of ``rows`` (numbered from ``start``) and flush."""
+        for row_num, row in enumerate(rows, start=start):
+            try:
+                self.add_row(row_num, row)
+            except Exception as row_error:
+                self._error(row_num, f"Error processing row: {row_error}")
+        self.flush()
+        return self
+
+    def to_dict(self, max_errors=10):
+        data = {
+            'message': summary_message(self.added, self.skipped, self.invalid, self.dry_run,
+                                       *((self.updated, self.unchanged) if self.upsert else ())),
+            'added': self.added,
+            'skipped': self.skipped,
+            'invalid': self.invalid,
+            'rows_read': self.rows_read
+        }
+        if self.upsert:
+            data['updated'] = self.updated
+            data['unchanged'] = self.unchanged
+        if self.errors:
+            data['errors'] = self.errors[:max_errors]
+        return data
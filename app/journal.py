@@ -0,0 +1,256 @@
+"""Write-behind ballot journal for absorbing the opening-minute surge.
+
+When ``BALLOT_JOURNAL`` is enabled, ``record_ballot`` fsync-appends the
+ballot to a local append-only segment file, then makes and commits the
+atomic voter claim, so no database lock is held across the fsync. A claim
+that loses or fails to commit appends an ``abort`` marker for its entry.
+A background flusher per worker seals the active segment every
+``BALLOT_JOURNAL_FLUSH_INTERVAL`` seconds and, once no request is still
+deciding an entry in it, batch-inserts its ballots into ``vote``, adds
+them to the tallies and the turnout rollup in the same transaction and
+deletes the segment.
+
+A ballot is applied only if its voter's claim is committed; per voter the
+last entry not marked aborted wins, so a retry after a failed commit
+replaces the failed ballot. A crash after the append leaves either an
+unclaimed voter (the ballot is dropped; the voter was never told it
+counted) or a claimed one (the ballot is applied), never a claimed voter
+without a ballot.
+
+Each worker holds an exclusive ``flock`` on the segments it owns. On
+startup, any segment whose lock can be taken belonged to a process that
+died before flushing it, and is replayed. Replays skip voters that already
+have votes recorded, so replaying a segment twice is harmless.
+"""
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+
+from . import db
+
+try:
+    import fcntl
+except ImportError:  # Windows - journal mode is not available
+    fcntl = None
+
+SEGMENT_GLOB = 'ballots-*.log'
+
+
+class _Segment:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'ab')
+        fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+        self.inflight = 0  # appended entries whose claim is not decided yet
+
+    def write(self, line):
+        self.file.write(line)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+
+class BallotJournal:
+    def __init__(self, app, directory, flush_interval=0.5):
+        if fcntl is None:
+            raise RuntimeError('BALLOT_JOURNAL requires a POSIX platform (fcntl.flock)')
+        self.app = app
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._sequence = 0
+        self._active = None
+        self._pending = []
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        os.makedirs(directory, exist_ok=True)
+
+    # -- writing -----------------------------------------------------------
+
+    def append(self, voter_id, selections, ip_address=None, user_agent=None):
+        """Durably record a submitted ballot; returns once it is fsynced.
+
+        The returned entry must be passed to :meth:`finish` once the voter's
+        claim is committed or has failed; until then its segment is not applied.
+        """
+        ballot_id = uuid.uuid4().hex
+        line = json.dumps({
+            'id': ballot_id,
+            'voter_id': voter_id,
+            'selections': [list(s) for s in selections],
+            'ip_address': ip_address,
+            'user_agent': user_agent,
+            'timestamp': datetime.utcnow().isoformat(),
+        }, separators=(',', ':')).encode('utf-8') + b'\n'
+
+        with self._lock:
+            self._ensure_flusher()
+            if self._active is None:
+                self._sequence += 1
+                self._active = _Segment(os.path.join(
+                    self.directory, f'ballots-{os.getpid()}-{time.time_ns()}-{self._sequence}.log'))
+            self._active.write(line)
+            self._active.inflight += 1
+            return self._active, ballot_id
+
+    def finish(self, entry, committed):
+        """Settle an appended entry: mark it aborted unless its claim was committed."""
+        segment, ballot_id = entry
+        with self._lock:
+            try:
+                if not committed:
+                    segment.write(json.dumps({'abort': ballot_id}).encode('utf-8') + b'\n')
+            finally:
+                segment.inflight -= 1
+
+    def _seal(self):
+        with self._lock:
+            segment, self._active = self._active, None
+        return segment
+
+    # -- flushing ----------------------------------------------------------
+
+    def flush(self):
+        """Seal the active segment and write all sealed ballots to the database.
+
+        A segment that fails to apply, or still has entries waiting on
+        their claim, stays pending (and locked) and is retried on the next
+        flush.
+        """
+        with self._flush_lock:
+            segment = self._seal()
+            if segment is not None:
+                self._pending.append(segment)
+
+            flushed = 0
+            for segment in list(self._pending):
+                with self._lock:
+                    if segment.inflight:
+                        continue
+                with open(segment.path, 'rb') as f:
+                    flushed += self._apply(f.read())
+                os.unlink(segment.path)
+                segment.file.close()
+                self._pending.remove(segment)
+            return flushed
+
+    def _apply(self, data):
+        """Insert the ballots in ``data`` of claimed voters that have no votes in the database yet."""
+        from .models import Vote, Voter
+        from .results import bump_results_version
+        from .tally import add_to_tallies
+        from .turnout import add_to_turnout, minute_of
+
+        entries = []
+        for raw in data.splitlines():
+            try:
+                entries.append(json.loads(raw))
+            except ValueError:
+                # A torn final line from a crash mid-append was never acknowledged
+                continue
+        aborted = {entry['abort'] for entry in entries if 'abort' in entry}
+        ballots = {}
+        for ballot in entries:
+            if 'voter_id' in ballot and ballot.get('id') not in aborted:
+                ballots[ballot['voter_id']] = ballot  # the last submission wins
+        if not ballots:
+            return 0
+
+        with self.app.app_context():
+            try:
+                skipped = {row[0] for row in db.session.execute(
+                    db.select(Vote.voter_id).where(Vote.voter_id.in_(ballots)).distinct())}
+                # An unclaimed voter's claim never committed, so that ballot was never accepted
+                claimed = set(db.session.scalars(
+                    db.select(Voter.id).where(Voter.id.in_(ballots), Voter.has_voted.is_(True))))
+                skipped |= set(ballots) - claimed
+                rows = []
+                counts = Counter()
+                minutes = Counter()
+                for voter_id, ballot in ballots.items():
+                    if voter_id in skipped:
+                        continue
+                    timestamp = datetime.fromisoformat(ballot['timestamp'])
+                    minutes[minute_of(timestamp)] += 1
+                    for position_id, candidate_id in ballot['selections']:
+                        rows.append({
+                            'voter_id': voter_id,
+                            'candidate_id': candidate_id,
+                            'position_id': position_id,
+                            'ip_address': ballot.get('ip_address'),
+                            'user_agent': ballot.get('user_agent'),
+                            'timestamp': timestamp,
+                        })
+                        counts[candidate_id] += 1
+                if rows:
+                    db.session.execute(db.insert(Vote), rows)
+                    add_to_tallies(counts)
+                    add_to_turnout(minutes)
+                db.session.commit()
+                if rows:
+                    bump_results_version()
+                return len(ballots) - len(skipped)
+            except Exception:
+                db.session.rollback()
+                raise
+
+    def recover(self):
+        """Replay segments left behind by workers that died before flushing."""
+        replayed = 0
+        for path in sorted(glob.glob(os.path.join(self.directory, SEGMENT_GLOB))):
+            try:
+                f = open(path, 'rb')
+            except FileNotFoundError:
+                continue
+            with f:
+                try:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    continue  # owned by a live worker
+                if os.fstat(f.fileno()).st_nlink == 0:
+                    continue  # another worker replayed it while we waited
+                replayed += self._apply(f.read())
+                os.unlink(path)
+        return replayed
+
+    # -- background flusher ------------------------------------------------
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Ballot journal flush failed, will retry: {e}")
+
+    def _ensure_flusher(self):
+        # Started lazily (under self._lock) so that each forked gunicorn worker runs its own flusher
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._active = None
+            self._pending = []
+            self._thread = threading.Thread(target=self._run, name='ballot-journal-flusher', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the flusher and flush whatever is still in the active segment."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+
+def init_journal(app):
+    """Recover unflushed segments and attach a journal to ``app``."""
+    directory = app.config.get('BALLOT_JOURNAL_DIR') or os.path.join(app.instance_path, 'journal')
+    journal = BallotJournal(app, directory, app.config.get('BALLOT_JOURNAL_FLUSH_INTERVAL', 0.5))
+    replayed = journal.recover()
+    if replayed:
+        print(f'Ballot journal: replayed {replayed} unflushed ballots')
+    app.extensions['ballot_journal'] = journal
+    return journal
@@ -0,0 +1,201 @@
+"""Server-Sent Events fan-out for live dashboard updates.
+
+One producer thread per worker watches a cheap version counter and, only
+when it changes, reads the data once and pushes an event to every
+connected client's queue. A thousand watchers therefore cost one read
+per change instead of a thousand page renders.
+
+Every open stream (or waiting long-poll) still holds one server thread,
+so :func:`stream_slots` caps them per worker at ``LIVE_MAX_STREAMS``; a
+page turned away falls back to polling an ETag endpoint, which holds a
+thread only for the length of each request.
+"""
+import json
+import queue
+import threading
+
+KEEPALIVE_SECONDS = 15
+QUEUE_SIZE = 16
+
+
+def sse_event(event, data):
+    """Format one SSE message."""
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+class Broadcaster:
+    """Poll ``version()`` and publish ``load()`` to subscribers when it changes.
+
+    ``diff(previous, current)`` turns two loaded snapshots into the payload
+    sent to already-connected clients; new clients get the full snapshot.
+    Both callables run inside an app context of ``app``.
+    """
+
+    def __init__(self, app, event, version, load, diff=None, poll_interval=1.0):
+        self.app = app
+        self.event = event
+        self.version = version
+        self.load = load
+        self.diff = diff or (lambda previous, current: current)
+        self.poll_interval = poll_interval
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._snapshot = None
+        self._snapshot_version = None
+
+    def _refresh(self):
+        """Reload the snapshot if the version moved; return the payload to publish."""
+        with self._refresh_lock, self.app.app_context():
+            version = self.version()
+            if version == self._snapshot_version:
+                return None
+            current = self.load()
+            previous, self._snapshot, self._snapshot_version = self._snapshot, current, version
+        return current if previous is None else self.diff(previous, current)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            with self._lock:
+                if not self._subscribers:
+                    self._thread = None
+                    return
+            try:
+                payload = self._refresh()
+            except Exception as e:
+                print(f"Live {self.event} refresh failed: {e}")
+                continue
+            if payload is not None:
+                self.publish(payload)
+
+    def publish(self, payload):
+        message = sse_event(self.event, payload)
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(message)
+            except queue.Full:
+                # A stalled client: drop it; EventSource reconnects and gets a fresh snapshot
+                self.unsubscribe(q)
+                try:
+                    q.get_nowait()
+                except queue.Empty:
+                    pass
+                q.put_nowait(None)
+
+    def notify(self):
+        """Check the version now instead of at the next poll."""
+        self._wake.set()
+
+    def subscribe(self):
+        q = queue.Queue(maxsize=QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.add(q)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f'live-{self.event}', daemon=True)
+                self._thread.start()
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def snapshot(self):
+        """The producer's latest full snapshot, loading the first one if needed.
+
+        Payloads carry absolute values, so a client that receives a change
+        already folded into its snapshot simply applies it twice.
+        """
+        if self._snapshot is None:
+            self._refresh()
+        return self._snapshot
+
+    def wait(self, unchanged, timeout):
+        """Block until the next publish or ``timeout`` seconds, unless ``unchanged()`` is already false.
+
+        ``unchanged`` is checked after subscribing, so a change between the
+        caller's own check and this call is never missed.
+        """
+        q = self.subscribe()
+        try:
+            if unchanged():
+                try:
+                    q.get(timeout=timeout)
+                except queue.Empty:
+                    pass
+        finally:
+            self.unsubscribe(q)
+
+    def stream(self):
+        """Generator of SSE messages for one client."""
+        q = self.subscribe()
+        try:
+            yield 'retry: 3000\n\n'
+            yield sse_event(self.event, self.snapshot())
+            while True:
+                try:
+                    message = q.get(timeout=KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                if message is None:
+                    return
+                yield message
+        finally:
+            self.unsubscribe(q)
+
+    def __len__(self):
+        return len(self._subscribers)
+
+
+def get_broadcaster(app, name, factory):
+    """Return the per-worker broadcaster ``name``, creating it with ``factory(app)``."""
+    broadcasters = app.extensions.setdefault('live_broadcasters', {})
+    with app.extensions.setdefault('live_lock', threading.Lock()):
+        if name not in broadcasters:
+            broadcasters[name] = factory(app)
+        return broadcasters[name]
+
+
+def stream_slots(app):
+    """Return this worker's semaphore of ``LIVE_MAX_STREAMS`` open-stream slots."""
+    with app.extensions.setdefault('live_lock', threading.Lock()):
+        slots = app.extensions.get('live_stream_slots')
+        if slots is None:
+            slots = threading.BoundedSemaphore(app.config.get('LIVE_MAX_STREAMS', 25))
+            app.extensions['live_stream_slots'] = slots
+        return slots
+
+
+def voting_state_broadcaster(app):
+    """Per-worker broadcaster of the voting open/closed state for ``/admin/voting-status/stream``.
+
+    Served entirely from the cached :class:`~app.voting_state.VotingState`;
+    ``is_open`` is part of the version so a passing deadline is pushed too.
+    """
+    from .voting_state import get_voting_state
+
+    def version():
+        state = get_voting_state()
+        return state.version, state.is_open
+
+    return get_broadcaster(app, 'voting', lambda app: Broadcaster(
+        app, 'voting', version, lambda: get_voting_state().to_dict(),
+        poll_interval=app.config.get('LIVE_POLL_INTERVAL', 1.0)))
+
+
+def results_broadcaster(app):
+    """Per-worker broadcaster of election results for ``/dashboard/stream``."""
+    from .results import election_results, results_delta, results_version
+
+    def load():
+        return dict(election_results().to_dict(), version=results_version())
+
+    return get_broadcaster(app, 'results', lambda app: Broadcaster(
+        app, 'results', results_version, load, results_delta,
+        poll_interval=app.config.get('LIVE_POLL_INTERVAL', 1.0)))
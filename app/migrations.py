@@ -0,0 +1,55 @@
+"""Schema upgrades that ``db.create_all()`` cannot apply to existing tables.
+
+``create_all`` only creates missing tables, so databases created before the
+hot-path indexes were declared on the models never get them. This migration
+creates every model index that is missing, on PostgreSQL and SQLite alike,
+and is safe to run repeatedly.
+"""
+from sqlalchemy import func, inspect
+
+from . import db
+from .models import Vote
+
+
+def _has_duplicate_votes(conn):
+    """True if some voter has more than one vote for the same position."""
+    duplicate = conn.execute(
+        db.select(Vote.voter_id)
+        .group_by(Vote.voter_id, Vote.position_id)
+        .having(func.count(Vote.id) > 1)
+        .limit(1)
+    ).first()
+    return duplicate is not None
+
+
+def apply_index_migration(engine=None):
+    """Create model indexes missing from the database.
+
+    Returns ``(created, skipped)`` lists of index names. The unique
+    ``uq_vote_voter_position`` index is skipped (not forced) while
+    duplicate votes exist, so an operator can inspect them first.
+    """
+    engine = engine or db.engine
+    created, skipped = [], []
+
+    for table in db.metadata.sorted_tables:
+        with engine.begin() as conn:
+            inspector = inspect(conn)
+            if not inspector.has_table(table.name):
+                continue
+            existing = {ix['name'] for ix in inspector.get_indexes(table.name)}
+
+            for index in sorted(table.indexes, key=lambda ix: ix.name):
+                if index.name in existing:
+                    continue
+                if index.unique and table.name == Vote.__tablename__ and _has_duplicate_votes(conn):
+                    print(f'Skipping {index.name}: duplicate (voter_id, position_id) votes exist')
+                    skipped.append(index.name)
+                    continue
+                index.create(conn, checkfirst=True)
+
+            # Dialect-specific indexes (ddl_if) are silently not created elsewhere
+            after = {ix['name'] for ix in inspect(conn).get_indexes(table.name)}
+            created.extend(sorted(after - existing))
+
+    return created, skipped
@@ -1,10 +1,19 @@
 from . import db
 from datetime import datetime
-import secrets
-import string
+from sqlalchemy.ext.hybrid import hybrid_property
 
 class Voter(db.Model):
     __tablename__ = 'voter'
+    __table_args__ = (
+        # Ballot login by (voter_id, voting_token) is already served by their unique indexes
+        # Turnout: count(*) WHERE has_voted
+        db.Index('ix_voter_has_voted', 'has_voted'),
+        # Admin registry pages sorted by name (keyset on full_name, id)
+        db.Index('ix_voter_full_name', 'full_name', 'id'),
+        # PostgreSQL only uses a btree for LIKE 'OBUSLG%' with pattern ops
+        db.Index('ix_voter_voter_id_pattern', 'voter_id',
+                 postgresql_ops={'voter_id': 'varchar_pattern_ops'}).ddl_if(dialect='postgresql'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     member_id = db.Column(db.String(50), unique=True, nullable=False)
     full_name = db.Column(db.String(100), nullable=False)
@@ -22,43 +31,20 @@ class Voter(db.Model):
                 self.voter_id = self.member_id
                 return
 
-        # Fallback to OBUSLG prefix with sequential number if MemberID is already used or not available
+        # Fallback to the next OBUSLG number from the counter shared by all workers
+        from .voter_ids import VoterNumberSequence, format_voter_id, highest_voter_number
+        sequence = VoterNumberSequence()
         while True:
-            # Find the highest existing OBUSLG number to continue sequentially
-            existing_obuslg = Voter.query.filter(Voter.voter_id.like('OBUSLG%')).all()
-            if existing_obuslg:
-                # Extract numbers from existing OBUSLG IDs and find the highest
-                max_number = 0
-                for voter in existing_obuslg:
-                    try:
-                        number = int(voter.voter_id[6:])  # Extract number after 'OBUSLG'
-                        max_number = max(max_number, number)
-                    except (ValueError, IndexError):
-                        continue
-                next_number = max_number + 1
-            else:
-                next_number = 1
-
-            # Generate OBUSLG ID with 3-digit padding
-            voter_id = f'OBUSLG{next_number:03d}'
+            voter_id = format_voter_id(sequence.reserve(1)[0])
 
             # Check if it already exists
             if not Voter.query.filter_by(voter_id=voter_id).first():
                 self.voter_id = voter_id
                 break
+            # The counter is behind IDs that were set directly
+            sequence.advance(highest_voter_number())
         return self.voter_id
 
-    def generate_voting_token(self):
-        """Generate a unique 8-digit numeric voting token"""
-        while True:
-            # Generate 8-digit numeric token
-            voting_token = ''.join(secrets.choice(string.digits) for _ in range(8))
-            # Check if it already exists
-            if not Voter.query.filter_by(voting_token=voting_token).first():
-                self.voting_token = voting_token
-                break
-        return self.voting_token
-
 class Position(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)  # President, Vice President, Secretary, Treasurer
@@ -70,7 +56,19 @@ class Position(db.Model):
     # Relationship to candidates
     candidates = db.relationship('Candidate', backref='position', lazy=True)
 
+    @hybrid_property
+    def is_voting_enabled(self):
+        # Rows from before the column existed hold NULL, which counts as enabled (the column default)
+        return self.voting_enabled is not False
+
+    @is_voting_enabled.expression
+    def is_voting_enabled(cls):
+        return db.func.coalesce(cls.voting_enabled, db.true())
+
 class Candidate(db.Model):
+    __table_args__ = (
+        db.Index('ix_candidate_position_id', 'position_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     bio = db.Column(db.Text)
@@ -82,6 +80,13 @@ class Candidate(db.Model):
     votes = db.relationship('Vote', backref='candidate', lazy=True)
 
 class Vote(db.Model):
+    __table_args__ = (
+        # One vote per voter per position; also serves lookups by voter_id
+        db.Index('uq_vote_voter_position', 'voter_id', 'position_id', unique=True),
+        # Per-candidate counts (tally rebuilds, audits)
+        db.Index('ix_vote_candidate_id', 'candidate_id'),
+        db.Index('ix_vote_position_candidate', 'position_id', 'candidate_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     voter_id = db.Column(db.Integer, db.ForeignKey('voter.id'), nullable=False)
     candidate_id = db.Column(db.Integer, db.ForeignKey('candidate.id'), nullable=False)
@@ -97,4 +102,59 @@ class Setting(db.Model):
     value = db.Column(db.String(255))
 
     def __repr__(self):
-        return f"<Setting {self.key}={self.value}>"
\ No newline at end of file
+        return f"<Setting {self.key}={self.value}>"
+
+class CandidateTally(db.Model):
+    """Running vote count per candidate, updated in the same transaction as each ballot."""
+    __tablename__ = 'candidate_tally'
+    candidate_id = db.Column(db.Integer, db.ForeignKey('candidate.id'), primary_key=True)
+    votes = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<CandidateTally {self.candidate_id}={self.votes}>"
+
+
+class TurnoutMinute(db.Model):
+    """Ballots committed per UTC minute, updated in the same transaction as each ballot (or journal batch)."""
+    __tablename__ = 'turnout_minute'
+    minute = db.Column(db.DateTime, primary_key=True)
+    ballots = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<TurnoutMinute {self.minute:%Y-%m-%d %H:%M}={self.ballots}>"
+
+
+class ImportJob(db.Model):
+    """A voter CSV import running in the background; progress is shared through the database."""
+    __tablename__ = 'import_job'
+    id = db.Column(db.String(32), primary_key=True)
+    filename = db.Column(db.String(255))
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, completed, failed
+    dry_run = db.Column(db.Boolean, nullable=False, default=False)  # validate only, write no voters
+    upsert = db.Column(db.Boolean, nullable=False, default=False)   # update registered members' details
+    rows_read = db.Column(db.Integer, nullable=False, default=0)
+    added = db.Column(db.Integer, nullable=False, default=0)
+    updated = db.Column(db.Integer, nullable=False, default=0)
+    unchanged = db.Column(db.Integer, nullable=False, default=0)
+    skipped = db.Column(db.Integer, nullable=False, default=0)
+    invalid = db.Column(db.Integer, nullable=False, default=0)
+    error_count = db.Column(db.Integer, nullable=False, default=0)
+    errors = db.Column(db.Text)  # JSON list of row errors, written when the job finishes
+    error = db.Column(db.Text)   # why a failed job stopped
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f"<ImportJob {self.id} {self.status}>"
+
+
+class IdCounter(db.Model):
+    """Named counters advanced atomically in SQL (voter ID numbers where there are no sequences)."""
+    __tablename__ = 'id_counter'
+    name = db.Column(db.String(32), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<IdCounter {self.name}={self.value}>"
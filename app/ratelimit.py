@@ -0,0 +1,131 @@
+"""Vote attempt rate limiting with a hard memory ceiling.
+
+Two interchangeable backends share the ``hit(key) -> bool`` interface, both
+implementing a token bucket (``attempts`` tokens refilled evenly over
+``window`` seconds):
+
+* ``MemoryRateLimiter`` - per-process, an LRU of at most ``max_keys`` buckets.
+* ``SQLiteRateLimiter`` - shared by every gunicorn worker on the node through
+  a small SQLite file with a fixed number of hashed slots, so the effective
+  limit no longer multiplies by the worker count and the file never grows
+  past ``max_keys`` rows.
+
+Both checks are O(1). Select the backend with ``RATE_LIMIT_BACKEND``.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+
+class MemoryRateLimiter:
+    def __init__(self, attempts, window, max_keys=10000):
+        self.capacity = float(attempts)
+        self.refill_rate = attempts / float(window)
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key, now=None):
+        """Consume one token for ``key``; return False if the bucket is empty."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = [self.capacity, now]
+                self._buckets[key] = bucket
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.capacity, bucket[0] + (now - bucket[1]) * self.refill_rate)
+                bucket[1] = now
+
+            if bucket[0] < 1:
+                return False
+            bucket[0] -= 1
+            return True
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class SQLiteRateLimiter:
+    def __init__(self, path, attempts, window, max_keys=65536):
+        self.path = path
+        self.capacity = float(attempts)
+        self.refill_rate = attempts / float(window)
+        self.max_keys = max_keys
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS buckets ('
+                         'slot INTEGER PRIMARY KEY, key TEXT NOT NULL, tokens REAL NOT NULL, updated REAL NOT NULL)')
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')  # limiter state is disposable
+            self._local.conn = conn
+        return conn
+
+    def _slot(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest()
+        return int.from_bytes(digest, 'big') % self.max_keys
+
+    def hit(self, key, now=None):
+        """Consume one token for ``key``; return False if the bucket is empty.
+
+        Keys hashing to an occupied slot evict the previous occupant, which
+        keeps the table at ``max_keys`` rows at most.
+        """
+        now = time.time() if now is None else now
+        slot = self._slot(key)
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT key, tokens, updated FROM buckets WHERE slot = ?', (slot,)).fetchone()
+            if row is None or row[0] != key:
+                tokens = self.capacity
+            else:
+                tokens = min(self.capacity, row[1] + (now - row[2]) * self.refill_rate)
+
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            conn.execute('INSERT OR REPLACE INTO buckets (slot, key, tokens, updated) VALUES (?, ?, ?, ?)',
+                         (slot, key, tokens, now))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return allowed
+
+    def __len__(self):
+        return self._connect().execute('SELECT COUNT(*) FROM buckets').fetchone()[0]
+
+
+def create_rate_limiter(config, instance_path):
+    attempts = config.get('RATE_LIMIT_ATTEMPTS', 10)
+    window = config.get('RATE_LIMIT_WINDOW', 300)
+    max_keys = config.get('RATE_LIMIT_MAX_KEYS', 65536)
+
+    if config.get('RATE_LIMIT_BACKEND', 'sqlite') == 'memory':
+        return MemoryRateLimiter(attempts, window, max_keys=max_keys)
+
+    path = config.get('RATE_LIMIT_DB') or os.path.join(instance_path, 'ratelimit.db')
+    return SQLiteRateLimiter(path, attempts, window, max_keys=max_keys)
+
+
+def get_rate_limiter():
+    """Return the app's rate limiter, creating it on first use."""
+    limiter = current_app.extensions.get('rate_limiter')
+    if limiter is None:
+        limiter = create_rate_limiter(current_app.config, current_app.instance_path)
+        current_app.extensions['rate_limiter'] = limiter
+    return limiter
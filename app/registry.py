@@ -0,0 +1,108 @@
+"""Keyset pagination over the voter registry for the admin dashboard.
+
+Pages are fetched with ``WHERE (sort_key, id) > (last_sort_key, last_id)``
+instead of ``OFFSET``, so page 400 costs the same index range scan as page 1
+and rows inserted meanwhile never shift later pages.
+"""
+import base64
+import json
+from collections import namedtuple
+
+from sqlalchemy import and_, or_
+
+from . import db
+from .models import Voter
+
+SORT_COLUMNS = {
+    'id': Voter.id,
+    'member_id': Voter.member_id,
+    'full_name': Voter.full_name,
+    'voter_id': Voter.voter_id,
+}
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+VoterPage = namedtuple('VoterPage', 'voters next_cursor')
+
+
+class InvalidPageRequest(ValueError):
+    pass
+
+
+def encode_cursor(sort, order, key, voter_id):
+    raw = json.dumps([sort, order, key, voter_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        sort, order, key, voter_id = json.loads(raw)
+    except (ValueError, TypeError):
+        raise InvalidPageRequest('Invalid cursor')
+    # Well-formed JSON of the wrong shape must not reach the query as a bind parameter
+    if not (isinstance(sort, str) and sort in SORT_COLUMNS and order in ('asc', 'desc')
+            and _is_int(voter_id)
+            and (_is_int(key) if sort == 'id' else isinstance(key, (str, type(None))))):
+        raise InvalidPageRequest('Invalid cursor')
+    return sort, order, key, voter_id
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def voter_to_dict(voter):
+    return {
+        'id': voter.id,
+        'member_id': voter.member_id,
+        'full_name': voter.full_name,
+        'voter_id': voter.voter_id,
+        'phone_number': voter.phone_number,
+        'voting_token': voter.voting_token,
+        'has_voted': bool(voter.has_voted),
+    }
+
+
+def voter_page(sort='id', order='asc', has_voted=None, limit=DEFAULT_LIMIT, cursor=None):
+    """Return one :class:`VoterPage` of voters ordered by ``sort`` then ``id``.
+
+    ``has_voted`` filters on voting status when not None. ``cursor`` is the
+    ``next_cursor`` of the previous page and must come from the same sort.
+    """
+    if sort not in SORT_COLUMNS:
+        raise InvalidPageRequest(f"sort must be one of: {', '.join(SORT_COLUMNS)}")
+    if order not in ('asc', 'desc'):
+        raise InvalidPageRequest("order must be 'asc' or 'desc'")
+    limit = max(1, min(int(limit), MAX_LIMIT))
+
+    column = SORT_COLUMNS[sort]
+    descending = order == 'desc'
+    query = db.select(Voter)
+    if has_voted is True:
+        query = query.where(Voter.has_voted.is_(True))
+    elif has_voted is False:
+        query = query.where(or_(Voter.has_voted.is_(False), Voter.has_voted.is_(None)))
+
+    if cursor:
+        cursor_sort, cursor_order, key, last_id = decode_cursor(cursor)
+        if (cursor_sort, cursor_order) != (sort, order):
+            raise InvalidPageRequest('Cursor belongs to a different sort order')
+        if sort == 'id':
+            query = query.where(Voter.id < last_id if descending else Voter.id > last_id)
+        elif descending:
+            query = query.where(or_(column < key, and_(column == key, Voter.id < last_id)))
+        else:
+            query = query.where(or_(column > key, and_(column == key, Voter.id > last_id)))
+
+    ordering = [column.desc(), Voter.id.desc()] if descending else [column, Voter.id]
+    query = query.order_by(*ordering[:1] if sort == 'id' else ordering)
+
+    # One extra row tells us whether another page exists without a COUNT
+    voters = db.session.scalars(query.limit(limit + 1)).all()
+    next_cursor = None
+    if len(voters) > limit:
+        voters = voters[:limit]
+        last = voters[-1]
+        next_cursor = encode_cursor(sort, order, getattr(last, column.key), last.id)
+    return VoterPage(voters, next_cursor)
@@ -0,0 +1,148 @@
+"""Election results aggregation shared by every results view.
+
+``election_results()`` builds the full position -> candidate -> votes
+structure from a single grouped query over positions, candidates and their
+running tallies, plus one aggregate for turnout, so the number of queries
+stays constant however many candidates or ballots there are.
+"""
+from collections import namedtuple
+
+from sqlalchemy import case, func
+
+from . import db, versions
+from .models import Candidate, CandidateTally, Position, Voter
+
+RESULTS_VERSION = 'results'
+
+
+def results_version():
+    """Monotonic version of everything ``election_results()`` returns.
+
+    Ballots and registry changes bump the ``results`` counter; ballot
+    structure changes (candidates, positions) bump the ``ballot`` counter.
+    Both only grow, so their sum does too - and reading it is two stat()s.
+    """
+    return versions.current(RESULTS_VERSION) + versions.current('ballot')
+
+
+def bump_results_version():
+    """Signal that results or turnout changed (call after the commit)."""
+    return versions.bump(RESULTS_VERSION)
+
+
+CandidateResult = namedtuple('CandidateResult', 'id name bio photo_url votes')
+
+
+class PositionResult(namedtuple('PositionResult', 'id name description voting_enabled candidates')):
+    """A position with its candidates and their vote counts."""
+    __slots__ = ()
+
+    @property
+    def total_votes(self):
+        return sum(c.votes for c in self.candidates)
+
+    @property
+    def votable(self):
+        return bool(self.voting_enabled) and bool(self.candidates)
+
+
+class ElectionResults(namedtuple('ElectionResults', 'positions total_voters voted_count')):
+    """Results for every position plus registry turnout."""
+    __slots__ = ()
+
+    @property
+    def turnout(self):
+        """Percentage of registered voters who have voted."""
+        return (self.voted_count / self.total_voters) * 100 if self.total_voters else 0.0
+
+    @property
+    def votable_positions(self):
+        return [p for p in self.positions if p.votable]
+
+    def to_dict(self, votable_only=True):
+        """Compact JSON-ready form used by the live stream and the results API."""
+        positions = self.votable_positions if votable_only else self.positions
+        return {
+            'total_voters': self.total_voters,
+            'voted_count': self.voted_count,
+            'turnout': round(self.turnout, 1),
+            'positions': [
+                {
+                    'id': p.id,
+                    'name': p.name,
+                    'candidates': [{'id': c.id, 'name': c.name, 'votes': c.votes} for c in p.candidates],
+                }
+                for p in positions
+            ],
+        }
+
+    def position_results(self, votable_only=False):
+        """Return ``{position name: {candidate name: votes}}`` as the templates expect."""
+        positions = self.votable_positions if votable_only else self.positions
+        return {p.name: {c.name: c.votes for c in p.candidates} for p in positions}
+
+
+def turnout_counts():
+    """Return ``(total_voters, voted_count)`` from one aggregate over ``voter``."""
+    total, voted = db.session.execute(
+        db.select(
+            func.count(Voter.id),
+            func.coalesce(func.sum(case((Voter.has_voted == True, 1), else_=0)), 0)  # noqa: E712
+        )
+    ).one()
+    return total, int(voted)
+
+
+def election_results():
+    """Return :class:`ElectionResults` for all positions, ordered by id."""
+    rows = db.session.execute(
+        db.select(
+            Position.id, Position.name, Position.description, Position.is_voting_enabled,
+            Candidate.id, Candidate.name, Candidate.bio, Candidate.photo_url,
+            func.coalesce(func.sum(CandidateTally.votes), 0),
+        )
+        .select_from(Position)
+        .outerjoin(Candidate, Candidate.position_id == Position.id)
+        .outerjoin(CandidateTally, CandidateTally.candidate_id == Candidate.id)
+        .group_by(Position.id, Candidate.id)
+        .order_by(Position.id, Candidate.id)
+    )
+
+    positions = []
+    current = None
+    for (position_id, position_name, description, voting_enabled,
+         candidate_id, candidate_name, bio, photo_url, votes) in rows:
+        if current is None or current.id != position_id:
+            current = PositionResult(position_id, position_name, description, bool(voting_enabled), [])
+            positions.append(current)
+        if candidate_id is not None:
+            current.candidates.append(CandidateResult(candidate_id, candidate_name, bio, photo_url, int(votes)))
+
+    total_voters, voted_count = turnout_counts()
+    return ElectionResults(positions, total_voters, voted_count)
+
+
+def _structure(payload):
+    return [(p['id'], p['name'], [(c['id'], c['name']) for c in p['candidates']])
+            for p in payload['positions']]
+
+
+def results_delta(previous, current):
+    """Smallest update turning ``previous`` into ``current`` (both from ``to_dict()``).
+
+    Vote counts are absolute, so applying a delta twice is harmless. If
+    positions or candidates changed the full ``current`` payload is returned
+    with ``full: true``.
+    """
+    if _structure(previous) != _structure(current):
+        return dict(current, full=True)
+
+    before = {c['id']: c['votes'] for p in previous['positions'] for c in p['candidates']}
+    return {
+        'version': current.get('version'),
+        'total_voters': current['total_voters'],
+        'voted_count': current['voted_count'],
+        'turnout': current['turnout'],
+        'votes': {str(c['id']): c['votes'] for p in current['positions'] for c in p['candidates']
+                  if before.get(c['id']) != c['votes']},
+    }
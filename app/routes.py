@@ -1,34 +1,39 @@
 from flask import Blueprint, request, render_template, redirect, url_for, flash, jsonify
-from flask import current_app, send_from_directory
+from flask import current_app, send_from_directory, send_file, Response, stream_with_context
 from . import db
 from .models import Voter, Candidate, Vote, Position
-from .models import Setting
-from datetime import datetime, timedelta
-import csv
-import io
-import json
+from .models import Setting, CandidateTally, TurnoutMinute, ImportJob
+from .tally import ensure_tally
+from .results import election_results, bump_results_version, results_version
+from .voting_state import get_voting_state, invalidate_voting_state
+from .ballot import get_ballot, invalidate_ballot, record_ballot
+from .ratelimit import get_rate_limiter
+from .live import results_broadcaster, stream_slots, voting_state_broadcaster
+from .fragment_cache import get_fragment_cache
+from .turnout import turnout_series
+from .registry import voter_page, voter_to_dict, InvalidPageRequest
+from .search import get_voter_index, invalidate_voter_search
+from .exports import csv_chunks, gzip_chunks, summary_rows, ballot_rows
+from .importer import load_registry_keys, VoterIdAllocator, TokenAllocator
+from .import_jobs import start_import_job, job_to_dict, report_path
+from .voter_ids import VoterNumberSequence
+from .upsert import upsert_insert
+from sqlalchemy import func
+from sqlalchemy.orm import selectinload
+from datetime import datetime
 import os
 from werkzeug.utils import secure_filename
-from collections import defaultdict
 
 main = Blueprint('main', __name__)
 admin = Blueprint('admin', __name__, url_prefix='/admin')
 
-# Simple rate limiting for vote attempts
-vote_attempts = defaultdict(list)
-RATE_LIMIT_WINDOW = timedelta(minutes=5)
-MAX_ATTEMPTS_PER_WINDOW = 10
-
 @main.route('/')
 def index():
     # Provide current voting status to the public home page
     try:
-        voting_open = False
-        voting_setting = Setting.query.filter_by(key='voting_open').first()
-        voting_until_setting = Setting.query.filter_by(key='voting_until').first()
-        if voting_setting and voting_setting.value == 'true':
-            voting_open = True
-        voting_until = voting_until_setting.value if voting_until_setting else None
+        status = get_voting_state().to_dict()
+        voting_open = status['voting_open']
+        voting_until = status['voting_until']
     except Exception:
         voting_open = False
         voting_until = None
@@ -43,38 +48,9 @@ def index():
 def vote():
     client_ip = request.remote_addr
 
-    # Update voting state if until timestamp passed
+    # Check voting status (cached per worker; auto-closes once voting_until passes)
     try:
-        def _update_voting_state_if_needed():
-            vs = Setting.query.filter_by(key='voting_open').first()
-            vu = Setting.query.filter_by(key='voting_until').first()
-            if vu:
-                import datetime
-                try:
-                    until_dt = datetime.datetime.fromisoformat(vu.value)
-                except Exception:
-                    # If parsing fails, don't auto-close
-                    return
-                if datetime.datetime.utcnow() > until_dt:
-                    # Time passed, close voting
-                    if vs:
-                        vs.value = 'false'
-                    try:
-                        db.session.delete(vu)
-                        db.session.commit()
-                    except Exception:
-                        db.session.rollback()
-
-        _update_voting_state_if_needed()
-    except Exception:
-        pass
-
-    # Check voting status setting
-    try:
-        voting_open = False
-        voting_setting = Setting.query.filter_by(key='voting_open').first()
-        if voting_setting and voting_setting.value == 'true':
-            voting_open = True
+        voting_open = get_voting_state().is_open
     except Exception:
         voting_open = False
 
@@ -86,20 +62,12 @@ def vote():
         voting_token = request.form.get('voting_token')
         print(f"VOTE ATTEMPT - IP: {client_ip}, Voter ID: {voter_id}, Token: {voting_token[:8]}...")
 
-        # Rate limiting check
-        now = datetime.utcnow()
-        # Clean old attempts
-        vote_attempts[client_ip] = [attempt for attempt in vote_attempts[client_ip]
-                                   if now - attempt < RATE_LIMIT_WINDOW]
-
-        if len(vote_attempts[client_ip]) >= MAX_ATTEMPTS_PER_WINDOW:
-            print(f"RATE LIMITED - IP: {client_ip}, Attempts: {len(vote_attempts[client_ip])}")
+        # Rate limiting check - records this attempt; shared across workers by default
+        if not get_rate_limiter().hit(client_ip):
+            print(f"RATE LIMITED - IP: {client_ip}")
             flash('Too many voting attempts. Please wait 5 minutes before trying again.', 'error')
             return redirect(url_for('main.vote'))
 
-        # Record this attempt
-        vote_attempts[client_ip].append(now)
-
         # Validate inputs
         if not voter_id:
             flash('Please enter your Voter ID.', 'error')
@@ -147,60 +115,35 @@ def vote():
             flash('This Voter ID has already been used.', 'error')
             return redirect(url_for('main.vote'))
 
-        # Get positions that have voting enabled and have candidates
+        # Validate selections against the cached ballot (votable positions with candidates)
         try:
-            all_positions = Position.query.all()
-            # Handle missing voting_enabled column
-            positions_with_voting = []
-            for pos in all_positions:
-                voting_enabled = getattr(pos, 'voting_enabled', True)  # Default to True if column missing
-                if voting_enabled and pos.candidates:
-                    positions_with_voting.append(pos)
-
-            positions = positions_with_voting
-            print(f"Found {len(positions)} votable positions with candidates")
+            selections = get_ballot().selections(request.form)
         except Exception as pos_error:
-            print(f"Error loading positions for voting: {pos_error}")
-            positions = []
-
-        votes_recorded = 0
-
-        for position in positions:
-            candidate_id = request.form.get(f'position_{position.id}')
-            if candidate_id:
-                candidate = Candidate.query.get(candidate_id)
-                if candidate and candidate.position_id == position.id:
-                    # Record the vote
-                    vote = Vote(
-                        voter_id=voter.id,
-                        candidate_id=candidate.id,
-                        position_id=position.id,
-                        ip_address=request.remote_addr,
-                        user_agent=request.headers.get('User-Agent')
-                    )
-                    db.session.add(vote)
-                    votes_recorded += 1
+            print(f"Error loading ballot for voting: {pos_error}")
+            selections = []
 
         # For this election, voters should vote for both positions, but we'll be flexible
-        if votes_recorded == 0:
+        if not selections:
             flash('Please select at least one candidate for the available positions.', 'error')
             return redirect(url_for('main.vote'))
 
-        # Mark voter as voted
-        voter.has_voted = True
-        db.session.commit()
+        # Claim the voter, insert all votes and bump tallies in one transaction
+        if not record_ballot(voter, selections,
+                             ip_address=request.remote_addr,
+                             user_agent=request.headers.get('User-Agent')):
+            print(f"VOTE REJECTED - Concurrent submission already claimed voter: {voter_id}")
+            flash('This Voter ID has already been used.', 'error')
+            return redirect(url_for('main.vote'))
 
         print(f"VOTE SUCCESS - Voter {voter.full_name} ({voter_id}) voted successfully")
         flash('Your votes have been recorded successfully!', 'success')
         return redirect(url_for('main.thank_you'))
 
     try:
-        # Get positions that have voting enabled and have candidates
-        all_positions = Position.query.all()
         # Only show positions where voting is enabled and have candidates
-        votable_positions = [pos for pos in all_positions if pos.voting_enabled and pos.candidates]
+        votable_positions = get_ballot().positions
 
-        print(f"Vote page loaded - Found {len(all_positions)} total positions, {len(votable_positions)} votable with candidates")
+        print(f"Vote page loaded - {len(votable_positions)} votable positions with candidates")
         return render_template('vote.html',
                               positions=votable_positions,
                               organization_name=current_app.config['ORGANIZATION_NAME'],
@@ -239,11 +182,14 @@ def admin_dashboard():
 
     if auth_ok:
         try:
-            # Get voter statistics - handle missing voting_token column gracefully
+            # Get voter statistics and results - handle missing voting_token column gracefully
+            results = None
             try:
-                total_voters = Voter.query.count()
-                voted_count = Voter.query.filter_by(has_voted=True).count()
+                results = election_results()
+                total_voters = results.total_voters
+                voted_count = results.voted_count
             except Exception as voter_error:
+                db.session.rollback()
                 print(f"Voter query error (likely missing voting_token column): {voter_error}")
                 # Try a more basic query without voting_token
                 try:
@@ -258,8 +204,8 @@ def admin_dashboard():
             try:
                 # Handle missing voting_enabled column gracefully
                 try:
-                    all_positions = Position.query.all()
-                    positions = all_positions  # Show all positions in admin
+                    # Candidates come in one extra SELECT ... IN, not one query per position in the template
+                    positions = _positions_with_candidates()  # Show all positions in admin
                     print(f"Loaded {len(positions)} positions successfully")
                 except Exception as pos_error:
                     print(f"Error loading positions: {pos_error}")
@@ -278,6 +224,7 @@ def admin_dashboard():
                                     self.max_votes = data[3]
                                     self.created_at = data[4]
                                     self.voting_enabled = True  # Default to enabled
+                                    self.is_voting_enabled = True
                                     self.candidates = []
 
                             positions.append(MockPosition(row))
@@ -286,51 +233,16 @@ def admin_dashboard():
                         print(f"Fallback query also failed: {fallback_error}")
                         positions = []
 
-                candidates = Candidate.query.all()
+                candidates = [c for p in positions for c in p.candidates]
             except Exception as e:
                 print(f"Error loading positions/candidates: {e}")
                 positions = []
                 candidates = []
 
-            # Get voters for display - handle missing voting_token column
-            try:
-                voters = Voter.query.all()
-            except Exception:
-                # Try without voting_token column
-                try:
-                    voters_result = db.session.execute(db.text("SELECT id, member_id, full_name, phone_number, voter_id, has_voted, created_at FROM voter"))
-                    voters = []
-                    for row in voters_result:
-                        # Create a mock voter object with available fields
-                        class MockVoter:
-                            def __init__(self, data):
-                                self.id = data[0]
-                                self.member_id = data[1]
-                                self.full_name = data[2]
-                                self.phone_number = data[3]
-                                self.voter_id = data[4]
-                                self.has_voted = data[5]
-                                self.created_at = data[6]
-                                self.voting_token = "N/A (column missing)"
-
-                        voters.append(MockVoter(row))
-                except Exception as e:
-                    print(f"Could not fetch voters: {e}")
-                    voters = []
+            # The voter table is fetched page by page from /admin/voters, not rendered here
 
-            # Get vote counts by position - count actual votes, not just candidate.votes relationship
-            position_results = {}
-            try:
-                for position in positions:
-                    position_candidates = Candidate.query.filter_by(position_id=position.id).all()
-                    position_results[position.name] = {}
-                    for candidate in position_candidates:
-                        # Count actual votes for this candidate in this position
-                        vote_count = Vote.query.filter_by(position_id=position.id, candidate_id=candidate.id).count()
-                        position_results[position.name][candidate.name] = vote_count
-            except Exception as e:
-                print(f"Error getting vote counts: {e}")
-                position_results = {}
+            # Vote counts by position come from the shared results aggregation
+            position_results = results.position_results() if results else {}
 
             print(f"Authorized view - Voters: {total_voters}, Positions: {len(positions)}, Candidates: {len(candidates)}")
 
@@ -389,7 +301,7 @@ def admin_dashboard():
                     print(f"Created {len(positions_data)} positions successfully")
 
                     # Refresh positions list
-                    positions = Position.query.all()
+                    positions = _positions_with_candidates()
                     print(f"Refreshed positions: now have {len(positions)} positions")
 
                 except Exception as e:
@@ -404,7 +316,6 @@ def admin_dashboard():
             voted_count = 0
             positions = []
             candidates = []
-            voters = []
             position_results = {}
             print("Fallback to empty data due to database error")
     else:
@@ -412,7 +323,6 @@ def admin_dashboard():
         voted_count = 0
         positions = []
         candidates = []
-        voters = []
         position_results = {}
         print("Unauthorized view - showing empty data")
 
@@ -421,7 +331,6 @@ def admin_dashboard():
                           voted_count=voted_count,
                           positions=positions,
                           candidates=candidates,
-                          voters=voters,
                           position_results=position_results,
                           auth_ok=auth_ok,
                           organization_name=current_app.config['ORGANIZATION_NAME'],
@@ -430,17 +339,14 @@ def admin_dashboard():
 @admin.route('/debug')
 def admin_debug():
     """Debug endpoint to show voter data without authorization"""
-    total_voters = Voter.query.count()
-    voted_count = Voter.query.filter_by(has_voted=True).count()
-    positions = Position.query.all()
-    candidates = Candidate.query.all()
-    voters = Voter.query.all()
+    results = election_results()
+    total_voters = results.total_voters
+    voted_count = results.voted_count
+    positions = _positions_with_candidates()
+    candidates = [c for p in positions for c in p.candidates]
 
     # Get vote counts by position
-    position_results = {}
-    for position in positions:
-        position_candidates = Candidate.query.filter_by(position_id=position.id).all()
-        position_results[position.name] = {c.name: len(c.votes) for c in position_candidates}
+    position_results = results.position_results()
 
     print(f"DEBUG ENDPOINT - Voters: {total_voters}, Positions: {len(positions)}")
 
@@ -449,7 +355,6 @@ def admin_debug():
                              voted_count=voted_count,
                              positions=positions,
                              candidates=candidates,
-                             voters=voters,
                              position_results=position_results,
                              auth_ok=True)
 
@@ -458,42 +363,28 @@ def admin_debug():
 def public_dashboard():
     """Public election dashboard showing live results"""
     try:
-        # Get voter statistics
-        total_voters = Voter.query.count()
-        voted_count = Voter.query.filter_by(has_voted=True).count()
-
-        # Get positions that have voting enabled and have candidates
-        try:
-            all_positions = Position.query.all()
-            # Handle missing voting_enabled column
-            positions_with_voting = []
-            for pos in all_positions:
-                voting_enabled = getattr(pos, 'voting_enabled', True)  # Default to True if column missing
-                if voting_enabled and pos.candidates:
-                    positions_with_voting.append(pos)
-
-            positions = positions_with_voting
-            print(f"Public dashboard: Found {len(positions)} votable positions with candidates")
-        except Exception as pos_error:
-            print(f"Error loading positions for public dashboard: {pos_error}")
-            positions = []
-
-        position_results = {}
-
-        for position in positions:
-            position_results[position.name] = {}
-            for candidate in position.candidates:
-                # Count votes for this specific candidate in this position
-                vote_count = Vote.query.filter_by(position_id=position.id, candidate_id=candidate.id).count()
-                position_results[position.name][candidate.name] = vote_count
+        organization_name = current_app.config['ORGANIZATION_NAME']
+        election_title = current_app.config['ELECTION_TITLE']
+
+        def render_results():
+            # Positions that have voting enabled and have candidates, with their tallies
+            results = election_results()
+            positions = results.votable_positions
+            print(f"Public dashboard: rendering {len(positions)} votable positions with candidates")
+            return render_template('_dashboard_results.html',
+                                   total_voters=results.total_voters,
+                                   voted_count=results.voted_count,
+                                   positions=positions,
+                                   position_results=results.position_results(votable_only=True))
+
+        # The results section is identical for every viewer, so render it once per results version
+        cache_key = ('dashboard', results_version(), organization_name, election_title)
+        results_html = get_fragment_cache(current_app).get_or_render(cache_key, render_results)
 
         return render_template('dashboard.html',
-                              total_voters=total_voters,
-                              voted_count=voted_count,
-                              positions=positions,
-                              position_results=position_results,
-                              organization_name=current_app.config['ORGANIZATION_NAME'],
-                              election_title=current_app.config['ELECTION_TITLE'])
+                              results_html=results_html,
+                              organization_name=organization_name,
+                              election_title=election_title)
 
     except Exception as e:
         print(f"Error loading public dashboard: {e}")
@@ -501,35 +392,143 @@ def public_dashboard():
         return f"<h1>Error loading dashboard</h1><p>Please contact the administrator. Error: {str(e)}</p>", 500
 
 
+def _sse_response(broadcaster):
+    """Stream ``broadcaster`` if this worker has a free stream slot, else answer 503.
+
+    Each stream holds a server thread until the page closes; a page turned
+    away polls the matching ETag endpoint instead.
+    """
+    slots = stream_slots(current_app._get_current_object())
+    if not slots.acquire(blocking=False):
+        response = jsonify({'error': 'Too many live connections, poll instead'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '60'
+        return response
+    response = Response(broadcaster.stream(),
+                        mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # Released on close even if the client disconnects before the first event
+    response.call_on_close(slots.release)
+    return response
+
+
+@main.route('/dashboard/stream')
+def dashboard_stream():
+    """Server-Sent Events stream of results: a full snapshot, then compact deltas."""
+    return _sse_response(results_broadcaster(current_app._get_current_object()))
+
+
+RESULTS_API_VERSION = 1
+
+
+@main.route('/api/results')
+def api_results():
+    """Machine-readable results with a strong ETag from the results version.
+
+    Pollers sending If-None-Match get a 304 from a version check alone,
+    without any database query.
+    """
+    version = results_version()
+    etag = f'results-{RESULTS_API_VERSION}-{version}'
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        try:
+            payload = election_results().to_dict()
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+        payload.update({'api_version': RESULTS_API_VERSION, 'version': version})
+        response = jsonify(payload)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@main.route('/api/turnout')
+def api_turnout():
+    """Ballots per minute and cumulative turnout, read only from the rollup table."""
+    version = results_version()
+    etag = f'turnout-{RESULTS_API_VERSION}-{version}'
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        try:
+            series = []
+            cumulative = 0
+            for minute, ballots in turnout_series():
+                cumulative += ballots
+                series.append({'minute': minute.isoformat() + 'Z', 'ballots': ballots, 'cumulative': cumulative})
+            total_voters = Voter.query.count()
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+        response = jsonify({'api_version': RESULTS_API_VERSION, 'version': version,
+                            'total_voters': total_voters, 'series': series})
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
 # Voting control endpoints
+LONG_POLL_MAX_WAIT = 30
+LONG_POLL_BUSY_RETRY = 60
+
+
+def _voting_etag(state):
+    return f'voting-{state.version}-{int(state.is_open)}'
+
+
 @admin.route('/voting-status')
 def voting_status():
-    """Return current voting status and countdown if set."""
+    """Return current voting status and countdown if set.
+
+    With ``wait=<seconds>`` (at most 30) and an ``If-None-Match`` of the
+    current state this is a long-poll: the request is held until voting
+    opens or closes, or the wait runs out (then 304). A waiting request
+    takes one of the worker's ``LIVE_MAX_STREAMS`` slots; when none is free
+    the answer comes at once with ``Retry-After`` and the page polls at that
+    rate instead.
+    """
     try:
-        # Auto-close if voting_until passed
-        vu = Setting.query.filter_by(key='voting_until').first()
-        if vu:
-            import datetime
-            try:
-                until_dt = datetime.datetime.fromisoformat(vu.value)
-                if datetime.datetime.utcnow() > until_dt:
-                    vs = Setting.query.filter_by(key='voting_open').first()
-                    if vs:
-                        vs.value = 'false'
-                        db.session.commit()
-                    db.session.delete(vu)
-                    db.session.commit()
-            except Exception:
-                pass
-
-        vs = Setting.query.filter_by(key='voting_open').first()
-        until = Setting.query.filter_by(key='voting_until').first()
-        return jsonify({
-            'voting_open': vs.value == 'true' if vs else False,
-            'voting_until': until.value if until else None
-        })
+        # Served from the per-worker cache; auto-close happens inside get_voting_state()
+        state = get_voting_state()
+        wait = max(0, min(request.args.get('wait', 0, type=int), LONG_POLL_MAX_WAIT))
+        retry_after = None
+        if wait and request.if_none_match.contains(_voting_etag(state)):
+            app = current_app._get_current_object()
+            slots = stream_slots(app)
+            if slots.acquire(blocking=False):
+                try:
+                    voting_state_broadcaster(app).wait(
+                        lambda: request.if_none_match.contains(_voting_etag(get_voting_state())), wait)
+                finally:
+                    slots.release()
+                state = get_voting_state()
+            else:
+                retry_after = LONG_POLL_BUSY_RETRY
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+    # An unchanged state costs a 304 and no database query
+    etag = _voting_etag(state)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(state.to_dict())
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    if retry_after:
+        response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+@admin.route('/voting-status/stream')
+def voting_status_stream():
+    """Server-Sent Events stream of the voting state for the admin dashboard, pushed when voting opens or closes.
+
+    Members long-poll ``/admin/voting-status?wait=`` instead.
+    """
+    if not _is_admin_stream_req(request):
+        return jsonify({'error': 'Unauthorized'}), 401
+    return _sse_response(voting_state_broadcaster(current_app._get_current_object()))
 
 
 @admin.route('/voting-control', methods=['POST'])
@@ -568,6 +567,8 @@ def voting_control():
                     db.session.delete(vu)
 
             db.session.commit()
+            invalidate_voting_state()
+            voting_state_broadcaster(current_app._get_current_object()).notify()
             return jsonify({'message': 'Voting opened'}), 200
 
         elif action == 'close':
@@ -578,6 +579,8 @@ def voting_control():
             if vu:
                 db.session.delete(vu)
             db.session.commit()
+            invalidate_voting_state()
+            voting_state_broadcaster(current_app._get_current_object()).notify()
             return jsonify({'message': 'Voting closed'}), 200
 
         else:
@@ -650,151 +653,27 @@ def upload_voters():
         if not file or not file.filename.endswith('.csv'):
             return jsonify({'error': 'Invalid file format. Please upload a CSV file.'}), 400
 
-        # Process CSV file
-        try:
-            # Read file content with better error handling
-            file_content = file.stream.read().decode("UTF8")
-            stream = io.StringIO(file_content, newline=None)
-            csv_input = csv.reader(stream)
-
-            # Get and validate header row
-            try:
-                header_row = next(csv_input)
-                print(f"CSV Header: {header_row}")
-            except StopIteration:
-                return jsonify({'error': 'CSV file is empty'}), 400
-
-            voters_added = 0
-            voters_skipped = 0
-            invalid_rows = 0
-            errors = []
+        # ?dry_run=1 (or a dry_run form field) only validates the file and reports every problem
+        dry_run = (request.values.get('dry_run') or '').lower() in ('1', 'true', 'on')
+        # mode=upsert updates the name and phone number of members already registered
+        mode = request.values.get('mode') or 'insert'
+        if mode not in ('insert', 'upsert'):
+            return jsonify({'error': "mode must be 'insert' or 'upsert'"}), 400
+        if mode == 'upsert' and upsert_insert() is None:
+            return jsonify({'error': 'Upsert imports need a PostgreSQL or SQLite database'}), 400
 
-            for row_num, row in enumerate(csv_input, start=2):
-                try:
-                    print(f"Processing row {row_num}: {row}")
-
-                    # Support both 3-column (without voting token) and 4-column (with voting token) format
-                    if len(row) >= 3:
-                        member_id = row[0].strip() if len(row) > 0 else ""
-                        full_name = row[1].strip() if len(row) > 1 else ""
-                        phone_number = row[2].strip() if len(row) > 2 else ""
-
-                        # Validate required data
-                        if not member_id or not full_name or not phone_number:
-                            error_msg = f"Row {row_num}: Missing required data (MemberID, FullName, or Phone)"
-                            errors.append(error_msg)
-                            print(error_msg)
-                            invalid_rows += 1
-                            continue
-
-                        # Basic phone number validation (should contain digits)
-                        if not any(char.isdigit() for char in phone_number):
-                            error_msg = f"Row {row_num}: Invalid phone number (no digits): {phone_number}"
-                            errors.append(error_msg)
-                            print(error_msg)
-                            invalid_rows += 1
-                            continue
-
-                        # Check if voter already exists - with better error handling
-                        try:
-                            existing_voter = Voter.query.filter_by(member_id=member_id).first()
-                            if existing_voter:
-                                print(f"Row {row_num}: Skipping duplicate member ID: {member_id}")
-                                voters_skipped += 1
-                                continue
-                        except Exception as db_error:
-                            error_msg = f"Row {row_num}: Database error checking voter {member_id}: {db_error}"
-                            errors.append(error_msg)
-                            print(error_msg)
-                            invalid_rows += 1
-                            continue
-
-                        # Generate voting token automatically if not provided in CSV
-                        voting_token = None
-                        if len(row) >= 4 and row[3].strip():
-                            # Use provided voting token if valid
-                            provided_token = row[3].strip()
-                            if provided_token.isdigit() and len(provided_token) == 8:
-                                voting_token = provided_token
-                            else:
-                                error_msg = f"Row {row_num}: Invalid voting token format for {member_id}, generating new one"
-                                errors.append(error_msg)
-                                print(error_msg)
-                                voting_token = None
-
-                        try:
-                            # Create voter object first to validate data
-                            voter_data = {
-                                'member_id': member_id,
-                                'full_name': full_name,
-                                'phone_number': phone_number,
-                                'voting_token': voting_token
-                            }
-
-                            # Test if we can create the voter object
-                            test_voter = Voter(**voter_data)
-                            test_voter.generate_voter_id()
-                            if not test_voter.voting_token:
-                                test_voter.generate_voting_token()
-
-                            # If we get here, the voter object is valid, so add to session
-                            db.session.add(test_voter)
-                            voters_added += 1
-                            print(f"Row {row_num}: Added voter: {member_id} - {full_name}")
-
-                        except Exception as voter_error:
-                            error_msg = f"Row {row_num}: Error creating voter {member_id}: {voter_error}"
-                            errors.append(error_msg)
-                            print(error_msg)
-                            invalid_rows += 1
-                            continue
-
-                except Exception as row_error:
-                    error_msg = f"Row {row_num}: Error processing row: {row_error}"
-                    errors.append(error_msg)
-                    print(error_msg)
-                    invalid_rows += 1
-                    continue
-
-            # Commit all changes - with comprehensive error handling
-            if voters_added > 0:
-                try:
-                    db.session.commit()
-                    print(f"Upload completed: {voters_added} added, {voters_skipped} skipped, {invalid_rows} invalid")
-                except Exception as commit_error:
-                    db.session.rollback()
-                    print(f"Database commit error: {commit_error}")
-                    import traceback
-                    traceback.print_exc()
-                    return jsonify({'error': f'Database error during save: {str(commit_error)}'}), 500
-            else:
-                print(f"No voters to commit: {voters_added} added, {voters_skipped} skipped, {invalid_rows} invalid")
-
-            message = f'{voters_added} voters uploaded successfully with Voter IDs generated'
-            if voters_skipped > 0:
-                message += f' ({voters_skipped} duplicates skipped)'
-            if invalid_rows > 0:
-                message += f' ({invalid_rows} invalid rows skipped)'
-
-            response_data = {
-                'message': message,
-                'added': voters_added,
-                'skipped': voters_skipped,
-                'invalid': invalid_rows
-            }
-
-            if errors:
-                response_data['errors'] = errors[:10]  # Limit to first 10 errors
-
-            return jsonify(response_data), 200
-
-        except UnicodeDecodeError:
-            return jsonify({'error': 'File encoding error. Please save your CSV file as UTF-8.'}), 400
-        except Exception as csv_error:
-            print(f"CSV processing error: {csv_error}")
+        # Spool the file and import it in the background; progress is polled from the job
+        try:
+            job_id = start_import_job(file, dry_run=dry_run, upsert=mode == 'upsert')
+        except Exception as job_error:
+            print(f"Could not start import job: {job_error}")
             import traceback
             traceback.print_exc()
-            return jsonify({'error': f'Error processing CSV file: {str(csv_error)}'}), 400
+            return jsonify({'error': f'Could not start import: {str(job_error)}'}), 500
+
+        data = job_to_dict(db.session.get(ImportJob, job_id))
+        data['status_url'] = url_for('admin.import_job_status', job_id=job_id)
+        return jsonify(data), 202
 
     except Exception as e:
         print(f"Upload error: {e}")
@@ -803,20 +682,66 @@ def upload_voters():
         # Always return JSON, never let an unhandled exception through
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
+@admin.route('/import-jobs/<job_id>', methods=['GET'])
+def import_job_status(job_id):
+    """Progress of a background voter import.
+
+    Counters are updated after every committed chunk; the full error list
+    is filled in when the job finishes.
+    """
+    if not _is_admin_req(request):
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    try:
+        job = db.session.get(ImportJob, job_id)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    if job is None:
+        return jsonify({'error': 'Import job not found'}), 404
+    return jsonify(job_to_dict(job)), 200
+
+@admin.route('/import-jobs/<job_id>/report', methods=['GET'])
+def import_job_report(job_id):
+    """CSV of every row a finished import rejected, skipped or corrected (Row, Status, Message)."""
+    if not _is_admin_req(request):
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    job = db.session.get(ImportJob, job_id)
+    if job is None or job.finished_at is None:
+        return jsonify({'error': 'Import job not found or still running'}), 404
+    path = report_path(job.id)
+    if not os.path.exists(path):
+        return jsonify({'error': 'Report has expired or was written on another server'}), 404
+    return send_file(path, mimetype='text/csv', as_attachment=True,
+                     download_name=f'voter_import_{"dry_run_" if job.dry_run else ""}report_{job.id}.csv')
+
 @admin.route('/generate-ids', methods=['POST'])
 def generate_voter_ids():
     if not request.headers.get('Authorization') == 'Bearer ' + current_app.config['ADMIN_TOKEN']:
         return jsonify({'error': 'Unauthorized'}), 401
 
-    voters = Voter.query.filter_by(voter_id=None).all()
-    ids_generated = 0
-
-    for voter in voters:
-        voter.generate_voter_id()
-        ids_generated += 1
+    voters = Voter.query.filter(db.or_(Voter.voter_id.is_(None), Voter.voting_token.is_(None))).all()
+    ids_generated = tokens_generated = 0
+
+    if voters:
+        # Allocate against the registry's keys in memory rather than querying per voter
+        _, voter_ids, tokens = load_registry_keys()
+        id_allocator = VoterIdAllocator(voter_ids - {None}, sequence=VoterNumberSequence())
+        needs_token = [voter for voter in voters if not voter.voting_token]
+        for voter, token in zip(needs_token, TokenAllocator(tokens - {None}).allocate_many(len(needs_token))):
+            voter.voting_token = token
+            tokens_generated += 1
+        for voter in voters:
+            if not voter.voter_id:
+                voter.voter_id = id_allocator.allocate(voter.member_id)
+                ids_generated += 1
 
     db.session.commit()
-    return jsonify({'message': f'Voter IDs generated for {ids_generated} voters'}), 200
+    if voters:
+        invalidate_voter_search()
+    return jsonify({'message': f'Voter IDs generated for {ids_generated} voters',
+                    'ids_generated': ids_generated,
+                    'tokens_generated': tokens_generated}), 200
 
 
 @admin.route('/export-results')
@@ -824,55 +749,39 @@ def export_results():
     if not request.headers.get('Authorization') == 'Bearer ' + current_app.config['ADMIN_TOKEN']:
         return jsonify({'error': 'Unauthorized'}), 401
 
-    # Get positions that have voting enabled and have candidates
-    try:
-        all_positions = Position.query.all()
-        # Handle missing voting_enabled column
-        positions_with_voting = []
-        for pos in all_positions:
-            voting_enabled = getattr(pos, 'voting_enabled', True)  # Default to True if column missing
-            if voting_enabled and pos.candidates:
-                positions_with_voting.append(pos)
-
-        positions = positions_with_voting
-        print(f"Export results: Found {len(positions)} votable positions with candidates")
-    except Exception as pos_error:
-        print(f"Error loading positions for export: {pos_error}")
-        positions = []
-
-    # Create CSV content
-    import io
-    output = io.StringIO()
-    writer = csv.writer(output)
-
-    # Write header
-    writer.writerow(['Position', 'Candidate', 'Votes'])
-
-    # Write data
-    for position in positions:
-        position_candidates = Candidate.query.filter_by(position_id=position.id).all()
-        for candidate in position_candidates:
-            writer.writerow([
-                position.name,
-                candidate.name,
-                len(candidate.votes)
-            ])
-
-    # Get CSV content
-    csv_content = output.getvalue()
-    output.close()
-
-    # Create response with CSV file
-    from flask import Response
-    response = Response(
-        csv_content,
+    # Streamed straight from the tally aggregation - one grouped query, no Vote rows loaded
+    return Response(
+        stream_with_context(csv_chunks(summary_rows())),
         mimetype='text/csv',
         headers={
             'Content-disposition': 'attachment; filename=slgs_obu_election_results.csv'
         }
     )
 
-    return response
+
+@admin.route('/export-ballots')
+def export_ballots():
+    """Ballot-level audit export: every vote row, streamed; ?gzip=1 compresses on the fly.
+
+    Voters appear only as an HMAC ballot reference, so rows of one ballot can
+    be grouped without revealing who cast it.
+    """
+    if not request.headers.get('Authorization') == 'Bearer ' + current_app.config['ADMIN_TOKEN']:
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    chunks = csv_chunks(ballot_rows(current_app.config['SECRET_KEY']))
+    filename = 'slgs_obu_ballots.csv'
+    mimetype = 'text/csv'
+    if request.args.get('gzip') == '1':
+        chunks = gzip_chunks(chunks)
+        filename += '.gz'
+        mimetype = 'application/gzip'
+
+    return Response(
+        stream_with_context(chunks),
+        mimetype=mimetype,
+        headers={'Content-disposition': f'attachment; filename={filename}'}
+    )
 
 @admin.route('/clear-voters', methods=['POST'])
 def clear_voters():
@@ -883,18 +792,83 @@ def clear_voters():
         # Clear all voters
         voters_cleared = db.session.query(Voter).count()
         db.session.query(Voter).delete()
+        VoterNumberSequence().reset()
         db.session.commit()
+        bump_results_version()
+        invalidate_voter_search()
         return jsonify({'message': f'All {voters_cleared} voters cleared successfully'})
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 
+def _positions_with_candidates():
+    """All positions with their candidates eager-loaded (two queries in total)."""
+    return Position.query.options(selectinload(Position.candidates)).order_by(Position.id).all()
+
+
 # Candidate management endpoints (admin-only)
 def _is_admin_req(req):
     return req.headers.get('Authorization') == 'Bearer ' + os.environ.get('ADMIN_TOKEN', 'admin-token')
 
 
+def _is_admin_stream_req(req):
+    # EventSource cannot send an Authorization header, so streams also take ?token= or the admin cookie
+    expected = os.environ.get('ADMIN_TOKEN', 'admin-token')
+    return _is_admin_req(req) or expected in (req.args.get('token'), req.cookies.get('admin_token'))
+
+
+@admin.route('/voters', methods=['GET'])
+def list_voters():
+    """One keyset page of the voter registry.
+
+    Query params: sort (id|member_id|full_name|voter_id), order (asc|desc),
+    has_voted (true|false), limit (max 500) and cursor (next_cursor of the
+    previous page).
+    """
+    if not _is_admin_req(request):
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    has_voted = request.args.get('has_voted')
+    if has_voted not in (None, '', 'true', 'false'):
+        return jsonify({'error': "has_voted must be 'true' or 'false'"}), 400
+    try:
+        page = voter_page(sort=request.args.get('sort', 'id'),
+                          order=request.args.get('order', 'asc'),
+                          has_voted={'true': True, 'false': False}.get(has_voted),
+                          limit=request.args.get('limit', 50, type=int),
+                          cursor=request.args.get('cursor'))
+    except InvalidPageRequest as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    return jsonify({'voters': [voter_to_dict(v) for v in page.voters],
+                    'next_cursor': page.next_cursor}), 200
+
+
+@admin.route('/voters/search', methods=['GET'])
+def search_voters():
+    """Typo-tolerant lookup by name, member ID, voter ID or phone number (q=..., limit=...)."""
+    if not _is_admin_req(request):
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'q is required'}), 400
+    limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+
+    try:
+        matches = get_voter_index().search(query, limit=limit)
+        # Current rows come from the database so status and tokens are never stale
+        voters = {v.id: v for v in Voter.query.filter(Voter.id.in_([pk for pk, _ in matches]))} if matches else {}
+        results = [dict(voter_to_dict(voters[pk]), score=round(score, 3)) for pk, score in matches if pk in voters]
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    return jsonify({'query': query, 'voters': results}), 200
+
+
 @admin.route('/candidates', methods=['GET'])
 def list_candidates():
     if not _is_admin_req(request):
@@ -956,7 +930,10 @@ def create_candidate():
 
         cand = Candidate(name=name, bio=bio, photo_url=photo_url, position_id=position_id)
         db.session.add(cand)
+        db.session.flush()
+        ensure_tally(cand.id)
         db.session.commit()
+        invalidate_ballot()
         return jsonify({'message': 'Candidate created', 'id': cand.id}), 201
     except Exception as e:
         db.session.rollback()
@@ -1007,6 +984,7 @@ def update_candidate(candidate_id):
             cand.position_id = data.get('position_id', cand.position_id)
 
         db.session.commit()
+        invalidate_ballot()
         return jsonify({'message': 'Candidate updated'}), 200
     except Exception as e:
         db.session.rollback()
@@ -1021,8 +999,10 @@ def delete_candidate(candidate_id):
         cand = Candidate.query.get(candidate_id)
         if not cand:
             return jsonify({'error': 'Not found'}), 404
+        CandidateTally.query.filter_by(candidate_id=cand.id).delete()
         db.session.delete(cand)
         db.session.commit()
+        invalidate_ballot()
         return jsonify({'message': 'Candidate deleted'})
     except Exception as e:
         db.session.rollback()
@@ -1033,13 +1013,23 @@ def delete_candidate(candidate_id):
 def list_positions():
     if not _is_admin_req(request):
         return jsonify({'error': 'Unauthorized'}), 401
-    positions = Position.query.all()
+    # Candidate counts come from one grouped subquery instead of loading each position's candidates
+    candidate_counts = (
+        db.select(Candidate.position_id, func.count(Candidate.id).label('candidate_count'))
+        .group_by(Candidate.position_id)
+        .subquery()
+    )
+    rows = db.session.execute(
+        db.select(Position, func.coalesce(candidate_counts.c.candidate_count, 0))
+        .outerjoin(candidate_counts, candidate_counts.c.position_id == Position.id)
+        .order_by(Position.id)
+    )
     return jsonify([{
         'id': p.id,
         'name': p.name,
-        'voting_enabled': p.voting_enabled,
-        'candidate_count': len(p.candidates)
-    } for p in positions])
+        'voting_enabled': p.is_voting_enabled,
+        'candidate_count': candidate_count
+    } for p, candidate_count in rows])
 
 
 @admin.route('/positions/<int:position_id>/toggle-voting', methods=['POST'])
@@ -1054,8 +1044,9 @@ def toggle_position_voting(position_id):
             return jsonify({'error': 'Position not found'}), 404
 
         # Toggle the voting status
-        position.voting_enabled = not position.voting_enabled
+        position.voting_enabled = not position.is_voting_enabled
         db.session.commit()
+        invalidate_ballot()
 
         return jsonify({
             'message': f'Voting {"enabled" if position.voting_enabled else "disabled"} for {position.name}',
@@ -1140,8 +1131,10 @@ def create_positions():
                     except Exception as fallback_error:
                         print(f'Fallback creation also failed for {name}: {fallback_error}')
 
+        # Commit even when nothing was created - existing positions may have been re-enabled
+        db.session.commit()
+        invalidate_ballot()
         if created_count > 0:
-            db.session.commit()
             print(f'Committed {created_count} new positions to database')
 
         # Return detailed status
@@ -1160,6 +1153,14 @@ def create_positions():
         return jsonify({'error': str(e)}), 500
 
 
+@admin.route('/cache-stats', methods=['GET'])
+def cache_stats():
+    """Hit/miss counters for this worker's rendered-fragment cache"""
+    if not _is_admin_req(request):
+        return jsonify({'error': 'Unauthorized'}), 401
+    return jsonify({'pid': os.getpid(), 'dashboard_fragments': get_fragment_cache(current_app).stats()}), 200
+
+
 @admin.route('/check-positions', methods=['GET'])
 def check_positions():
     """Debug endpoint to check current positions in database"""
@@ -1360,13 +1361,16 @@ def clear_all_data():
         votes_cleared = Vote.query.count()
         Vote.query.delete()
 
-        # Clear all candidates
+        # Clear tallies, the turnout rollup and all candidates
+        CandidateTally.query.delete()
+        TurnoutMinute.query.delete()
         candidates_cleared = Candidate.query.count()
         Candidate.query.delete()
 
         # Clear all voters (now that votes are cleared)
         voters_cleared = Voter.query.count()
         Voter.query.delete()
+        VoterNumberSequence().reset()
 
         # Reset voting status
         voting_setting = Setting.query.filter_by(key='voting_open').first()
@@ -1378,6 +1382,10 @@ def clear_all_data():
             db.session.delete(until_setting)
 
         db.session.commit()
+        invalidate_voting_state()
+        invalidate_ballot()
+        bump_results_version()
+        invalidate_voter_search()
 
         return jsonify({
             'message': f'System reset successful: {voters_cleared} voters, {votes_cleared} votes, and {candidates_cleared} candidates cleared'
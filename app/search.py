@@ -0,0 +1,265 @@
+"""Per-worker typo-tolerant search over the voter registry.
+
+Each voter's name words, member ID, voter ID and phone digits are indexed
+as whole words with posting arrays, built lazily on the first search.
+A query word matches an indexed word when it is
+
+* equal to it, or a prefix of it ("obuslg00", "moh"),
+* one edit away from it, for names ("jonh" -> "john", "kamarra" -> "kamara"),
+  found through a delete-neighbourhood table rather than scanning the
+  vocabulary, or
+* for phone numbers, a suffix of the stored digits, so "076 123 456" finds
+  "+232 76 123 456".
+
+Voters must match every query word (all but one in queries of three or
+more words) and are ranked by how many matched, then by how many matched
+exactly or by prefix. Matching works on the vocabulary, which is far
+smaller than the registry, and combining words is set intersection, so
+lookups stay in the low milliseconds at 100k voters.
+
+Imports bump the ``voters_added`` counter and each worker catches up by
+indexing rows with a higher id; deletes and edits bump ``voters_reset``,
+which triggers a full rebuild on the next search. A published index is
+never modified: catch-ups are applied to a copy that then replaces it, so
+searches running in other threads read it without a lock.
+"""
+import heapq
+import re
+import threading
+from array import array
+from bisect import bisect_left
+
+from flask import current_app
+
+from . import db, versions
+from .models import Voter
+
+VERSION_ADDED = 'voters_added'
+VERSION_RESET = 'voters_reset'
+DEFAULT_LIMIT = 20
+MIN_TYPO_LENGTH = 4
+MIN_PHONE_DIGITS = 4
+# A prefix matching more words than this ("ob", "m0") does not narrow anything down
+MAX_PREFIX_WORDS = 2000
+
+_PHONE_QUERY = re.compile(r'[\d\s+\-().]+')
+
+
+def _words(text):
+    """Lower-cased whitespace-separated words with punctuation removed."""
+    words = (''.join(ch for ch in token.lower() if ch.isalnum()) for token in (text or '').split())
+    return [word for word in words if word]
+
+
+def _digits(text):
+    return ''.join(ch for ch in (text or '') if ch.isdigit())
+
+
+def _deletes(word):
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+def _within_one_edit(a, b):
+    """True if ``a`` and ``b`` differ by at most one insert, delete, substitution or adjacent swap."""
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    i = 0
+    while i < min(len(a), len(b)) and a[i] == b[i]:
+        i += 1
+    if len(a) == len(b):
+        return a[i + 1:] == b[i + 1:] or (a[i + 2:] == b[i + 2:] and a[i:i + 2] == b[i:i + 2][::-1])
+    shorter, longer = (a, b) if len(a) < len(b) else (b, a)
+    return shorter[i:] == longer[i + 1:]
+
+
+def document_words(member_id, full_name, voter_id, phone_number):
+    words = _words(full_name)
+    words += [''.join(_words(ident)) for ident in (member_id, voter_id) if _words(ident)]
+    if _digits(phone_number):
+        words.append(_digits(phone_number))
+    return words
+
+
+def query_words(query):
+    """Return ``(words, is_phone)``; "076 123 456" is one phone number, not three words."""
+    if _PHONE_QUERY.fullmatch(query) and len(_digits(query)) >= MIN_PHONE_DIGITS:
+        return [_digits(query)], True
+    return _words(query), False
+
+
+class VoterSearchIndex:
+    def __init__(self):
+        self._ids = array('q')      # doc -> Voter.id
+        self._sizes = array('H')    # doc -> number of words, to rank closer matches first
+        self._doc_of = {}           # Voter.id -> its current doc
+        self._dead = set()          # docs replaced by a later add()
+        self._word_docs = {}        # word -> array of docs
+        self._phone_docs = {}       # reversed phone digits -> array of docs
+        self._near = {}             # name word or one-letter delete of it -> name words
+        self._sorted_words = None   # built lazily for prefix lookups
+        self._sorted_phones = None
+        self.max_id = 0
+        self.added_version = None
+        self.reset_version = None
+
+    def __len__(self):
+        return len(self._doc_of)
+
+    def add(self, pk, member_id, full_name, voter_id, phone_number):
+        """Index one voter; re-adding a voter replaces its previous entry."""
+        previous = self._doc_of.get(pk)
+        if previous is not None:
+            self._dead.add(previous)
+        doc = len(self._ids)
+        words = set(document_words(member_id, full_name, voter_id, phone_number))
+        self._ids.append(pk)
+        self._sizes.append(min(len(words), 0xFFFF))
+        self._doc_of[pk] = doc
+        self.max_id = max(self.max_id, pk)
+
+        for word in words:
+            postings = self._word_docs.get(word)
+            if postings is None:
+                postings = self._word_docs[word] = array('l')
+                self._sorted_words = None
+                if word.isalpha() and len(word) >= MIN_TYPO_LENGTH - 1:
+                    for key in _deletes(word) | {word}:
+                        self._near.setdefault(key, set()).add(word)
+            postings.append(doc)
+
+        digits = _digits(phone_number)
+        if digits:
+            key = digits[::-1]
+            postings = self._phone_docs.get(key)
+            if postings is None:
+                postings = self._phone_docs[key] = array('l')
+                self._sorted_phones = None
+            postings.append(doc)
+
+    def copy(self):
+        """Return an independent copy that can be extended while this one is being searched."""
+        other = VoterSearchIndex()
+        other._ids = array('q', self._ids)
+        other._sizes = array('H', self._sizes)
+        other._doc_of = dict(self._doc_of)
+        other._dead = set(self._dead)
+        other._word_docs = {word: array('l', docs) for word, docs in self._word_docs.items()}
+        other._phone_docs = {key: array('l', docs) for key, docs in self._phone_docs.items()}
+        other._near = {key: set(words) for key, words in self._near.items()}
+        other._sorted_words = self._sorted_words
+        other._sorted_phones = self._sorted_phones
+        other.max_id = self.max_id
+        other.added_version = self.added_version
+        other.reset_version = self.reset_version
+        return other
+
+    def load(self, after_id=0):
+        """Index voters with ``id > after_id`` from the database; returns how many."""
+        rows = db.session.execute(
+            db.select(Voter.id, Voter.member_id, Voter.full_name, Voter.voter_id, Voter.phone_number)
+            .where(Voter.id > after_id)
+            .order_by(Voter.id)
+        )
+        loaded = 0
+        for row in rows:
+            self.add(*row)
+            loaded += 1
+        return loaded
+
+    @staticmethod
+    def _with_prefix(sorted_keys, prefix):
+        start = bisect_left(sorted_keys, prefix)
+        end = bisect_left(sorted_keys, prefix + '\U0010ffff', start)
+        if end - start > MAX_PREFIX_WORDS:
+            return []
+        return sorted_keys[start:end]
+
+    def _match(self, word, is_phone):
+        """Return ``(strong, typo)`` sets of docs matching one query word."""
+        if self._sorted_words is None:
+            self._sorted_words = sorted(self._word_docs)
+        strong = set()
+        for match in self._with_prefix(self._sorted_words, word):
+            strong.update(self._word_docs[match])
+
+        if is_phone:
+            if self._sorted_phones is None:
+                self._sorted_phones = sorted(self._phone_docs)
+            for match in self._with_prefix(self._sorted_phones, word.lstrip('0')[::-1]):
+                strong.update(self._phone_docs[match])
+
+        typo = set()
+        if word.isalpha() and len(word) >= MIN_TYPO_LENGTH:
+            candidates = set()
+            for key in _deletes(word) | {word}:
+                candidates.update(self._near.get(key, ()))
+            for match in candidates:
+                if match != word and _within_one_edit(word, match):
+                    typo.update(self._word_docs[match])
+        return strong, typo - strong
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """Return ``[(voter id, score)]``, best matches first; score is 1.0 for a full exact match."""
+        words, is_phone = query_words(query)
+        words = list(dict.fromkeys(words))
+        if not words:
+            return []
+
+        matches = [self._match(word, is_phone) for word in words]
+        found = [strong | typo for strong, typo in matches]
+        # Every word must match, but allow one miss in longer queries
+        if len(words) <= 2:
+            candidates = set.intersection(*found)
+        else:
+            candidates = set().union(*(set.intersection(*(found[:i] + found[i + 1:])) for i in range(len(found))))
+
+        best = heapq.nsmallest(
+            limit,
+            ((-sum(doc in docs for docs in found), -sum(doc in strong for strong, _ in matches),
+              self._sizes[doc], self._ids[doc]) for doc in candidates if doc not in self._dead),
+        )
+        return [(pk, (-count - strong) / (2 * len(words))) for count, strong, _, pk in best]
+
+
+def build_voter_index():
+    index = VoterSearchIndex()
+    index.load()
+    return index
+
+
+def get_voter_index():
+    """Return this worker's index, building or catching it up if the registry changed."""
+    cache = current_app.extensions.setdefault('voter_search', {})
+    with cache.setdefault('lock', threading.Lock()):
+        reset = versions.current(VERSION_RESET)
+        added = versions.current(VERSION_ADDED)
+        index = cache.get('index')
+
+        if index is not None and index.reset_version == reset and index.added_version != added:
+            # Other threads may be searching the cached index; catch up a copy and swap it in
+            index = index.copy()
+            index.added_version = added
+            index.load(after_id=index.max_id)
+            # Concurrent imports can commit lower ids after higher ones; rebuild if any were missed
+            if len(index) != Voter.query.count():
+                index = None
+            else:
+                cache['index'] = index
+
+        if index is None or index.reset_version != reset:
+            index = build_voter_index()
+            index.reset_version, index.added_version = reset, added
+            cache['index'] = index
+        return index
+
+
+def voters_imported():
+    """Tell every worker's index that new voters were committed."""
+    versions.bump(VERSION_ADDED)
+
+
+def invalidate_voter_search():
+    """Tell every worker's index to rebuild after voters were deleted or edited."""
+    versions.bump(VERSION_RESET)
@@ -0,0 +1,122 @@
+"""Incrementally maintained vote tallies.
+
+Every ballot bumps one ``candidate_tally`` row per selected candidate inside
+the ballot transaction, so reading results costs O(candidates) no matter how
+many rows the ``vote`` table holds.
+"""
+from sqlalchemy import bindparam, func
+
+from . import db
+from .models import Candidate, CandidateTally, Vote
+from .upsert import upsert_insert
+
+
+def increment_tallies(candidate_ids):
+    """Add one vote to each candidate in ``candidate_ids``.
+
+    Must be called inside the ballot transaction; the caller commits.
+    A ballot selects at most one candidate per position, so a single
+    ``UPDATE ... WHERE candidate_id IN (...)`` covers the whole ballot.
+    """
+    candidate_ids = set(candidate_ids)
+    if not candidate_ids:
+        return
+
+    result = db.session.execute(
+        db.update(CandidateTally)
+        .where(CandidateTally.candidate_id.in_(candidate_ids))
+        .values(votes=CandidateTally.votes + 1)
+    )
+
+    if result.rowcount < len(candidate_ids):
+        # Candidate created before tallies existed - add the missing rows
+        existing = {row[0] for row in db.session.execute(
+            db.select(CandidateTally.candidate_id)
+            .where(CandidateTally.candidate_id.in_(candidate_ids))
+        )}
+        _insert_tallies({candidate_id: 1 for candidate_id in candidate_ids - existing})
+
+
+def _insert_tallies(counts):
+    """Insert tally rows for ``{candidate_id: votes}`` (caller commits).
+
+    Two first votes for the same candidate can both find its row missing,
+    so the insert adds to a row a concurrent ballot created first instead
+    of failing on the primary key.
+    """
+    if not counts:
+        return
+    insert = upsert_insert()
+    if insert is None:
+        for candidate_id, n in counts.items():
+            db.session.add(CandidateTally(candidate_id=candidate_id, votes=n))
+        return
+
+    tally_table = CandidateTally.__table__
+    stmt = insert(tally_table)
+    db.session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=['candidate_id'],
+            set_={'votes': tally_table.c.votes + stmt.excluded.votes},
+        ),
+        [{'candidate_id': candidate_id, 'votes': n} for candidate_id, n in sorted(counts.items())]
+    )
+
+
+def add_to_tallies(counts):
+    """Add ``{candidate_id: votes}`` to the tallies - used for batched ballots.
+
+    Must be called inside a transaction; the caller commits.
+    """
+    counts = {candidate_id: n for candidate_id, n in counts.items() if n}
+    if not counts:
+        return
+
+    existing = {row[0] for row in db.session.execute(
+        db.select(CandidateTally.candidate_id).where(CandidateTally.candidate_id.in_(counts))
+    )}
+    tally_table = CandidateTally.__table__
+    if existing:
+        db.session.execute(
+            tally_table.update()
+            .where(tally_table.c.candidate_id == bindparam('cid'))
+            .values(votes=tally_table.c.votes + bindparam('n')),
+            [{'cid': candidate_id, 'n': counts[candidate_id]} for candidate_id in existing]
+        )
+    _insert_tallies({candidate_id: counts[candidate_id] for candidate_id in counts.keys() - existing})
+
+
+def ensure_tally(candidate_id):
+    """Create an empty tally row for a new candidate (caller commits)."""
+    if db.session.get(CandidateTally, candidate_id) is None:
+        db.session.add(CandidateTally(candidate_id=candidate_id, votes=0))
+
+
+def tally_counts():
+    """Return ``{candidate_id: votes}`` for every tallied candidate."""
+    return {candidate_id: votes for candidate_id, votes in
+            db.session.execute(db.select(CandidateTally.candidate_id, CandidateTally.votes))}
+
+
+def rebuild_tallies():
+    """Recompute every tally from the ``vote`` table (caller commits)."""
+    counts = dict(db.session.execute(
+        db.select(Vote.candidate_id, func.count(Vote.id)).group_by(Vote.candidate_id)
+    ).all())
+    candidate_ids = [row[0] for row in db.session.execute(db.select(Candidate.id))]
+
+    db.session.execute(db.delete(CandidateTally))
+    db.session.add_all([
+        CandidateTally(candidate_id=candidate_id, votes=counts.get(candidate_id, 0))
+        for candidate_id in candidate_ids
+    ])
+    return len(candidate_ids)
+
+
+def backfill_tallies_if_needed():
+    """Populate tallies for databases created before the tally table existed."""
+    if CandidateTally.query.count() == 0 and Candidate.query.count() > 0:
+        rebuilt = rebuild_tallies()
+        db.session.commit()
+        return rebuilt
+    return 0
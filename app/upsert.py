@@ -0,0 +1,14 @@
+"""Dialect-specific ``INSERT`` constructs for ``ON CONFLICT`` upserts."""
+from . import db
+
+
+def upsert_insert():
+    """The dialect's INSERT supporting ON CONFLICT, or None."""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    return insert
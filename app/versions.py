@@ -0,0 +1,34 @@
+"""Cheap cross-worker change counters.
+
+Each counter is a file in ``VERSIONS_DIR`` (``instance/versions`` by default).
+Bumping appends a single byte with ``O_APPEND``, which is atomic across
+processes, and the version is simply the file size - so every gunicorn worker
+on the node can check for changes with one ``stat()`` and no database query.
+"""
+import os
+
+from flask import current_app
+
+
+def _path(name):
+    directory = current_app.config.get('VERSIONS_DIR') or os.path.join(current_app.instance_path, 'versions')
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, name)
+
+
+def current(name):
+    """Return the current version of counter ``name`` (0 if never bumped)."""
+    try:
+        return os.stat(_path(name)).st_size
+    except FileNotFoundError:
+        return 0
+
+
+def bump(name):
+    """Increment counter ``name`` and return its new version."""
+    fd = os.open(_path(name), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, b'.')
+        return os.fstat(fd).st_size
+    finally:
+        os.close(fd)
@@ -0,0 +1,124 @@
+"""Cross-worker counter for ``OBUSLG<n>`` voter IDs.
+
+Numbers are handed out by the database, so two imports running in
+different workers never pick the same one:
+
+* PostgreSQL: the ``voter_number_seq`` sequence. A block of ``n`` numbers
+  is ``SELECT nextval(...) FROM generate_series(1, n)``, one statement,
+  and a sequence never gives the same value to two sessions.
+* SQLite (and anything else): the ``voter_number`` row of ``id_counter``,
+  advanced with ``UPDATE ... SET value = value + n RETURNING value``. The
+  update takes SQLite's write lock, so ``value - n + 1 .. value`` belongs
+  to this transaction; the caller's commit releases the lock.
+
+Voter IDs can also be set directly (a member ID such as ``OBUSLG042`` is
+reused as the voter ID), so allocators still skip numbers that are taken
+and :meth:`VoterNumberSequence.advance` moves the counter past them.
+"""
+from sqlalchemy import text
+
+from . import db
+from .models import IdCounter, Voter
+
+VOTER_ID_PREFIX = 'OBUSLG'
+SEQUENCE_NAME = 'voter_number_seq'
+COUNTER_NAME = 'voter_number'
+
+
+def obuslg_number(voter_id):
+    """The number of an ``OBUSLG<n>`` voter ID, or None for any other ID."""
+    if voter_id and voter_id.startswith(VOTER_ID_PREFIX) and voter_id[len(VOTER_ID_PREFIX):].isdigit():
+        return int(voter_id[len(VOTER_ID_PREFIX):])
+    return None
+
+
+def format_voter_id(number):
+    return f'{VOTER_ID_PREFIX}{number:03d}'
+
+
+class VoterNumberSequence:
+    """The database counter behind ``OBUSLG`` numbers."""
+
+    def __init__(self, session=None):
+        self.session = session or db.session
+
+    @property
+    def _uses_sequence(self):
+        return self.session.get_bind().dialect.name == 'postgresql'
+
+    def ensure(self):
+        """Create the sequence or counter row if it does not exist yet."""
+        if self._uses_sequence:
+            self.session.execute(text(f'CREATE SEQUENCE IF NOT EXISTS {SEQUENCE_NAME}'))
+        elif self.session.get(IdCounter, COUNTER_NAME) is None:
+            self.session.add(IdCounter(name=COUNTER_NAME, value=0))
+            self.session.flush()
+
+    def reserve(self, count):
+        """Return ``count`` numbers no other caller will be given, in ascending order."""
+        if count <= 0:
+            return []
+        if self._uses_sequence:
+            rows = self.session.execute(
+                text(f"SELECT nextval('{SEQUENCE_NAME}') FROM generate_series(1, :count)"), {'count': count})
+            return sorted(row[0] for row in rows)
+
+        statement = (
+            db.update(IdCounter)
+            .where(IdCounter.name == COUNTER_NAME)
+            .values(value=IdCounter.value + count)
+            .returning(IdCounter.value)
+        )
+        last = self.session.execute(statement).scalar()
+        if last is None:
+            self.ensure()
+            last = self.session.execute(statement).scalar()
+        return list(range(last - count + 1, last + 1))
+
+    def advance(self, number):
+        """Make sure numbers up to ``number`` are never reserved."""
+        if self._uses_sequence:
+            # setval cannot compare-and-set, so a number handed out concurrently
+            # can be repeated; allocators skip taken IDs and voter_id is unique
+            self.session.execute(
+                text(f"SELECT setval('{SEQUENCE_NAME}', :number) "
+                     f"WHERE :number > (SELECT last_value FROM {SEQUENCE_NAME})"),
+                {'number': number})
+            return
+        self.ensure()
+        self.session.execute(
+            db.update(IdCounter)
+            .where(IdCounter.name == COUNTER_NAME, IdCounter.value < number)
+            .values(value=number)
+        )
+
+    def reset(self):
+        """Start numbering again from 1, after the registry was cleared."""
+        if self._uses_sequence:
+            self.session.execute(text(f'ALTER SEQUENCE {SEQUENCE_NAME} RESTART WITH 1'))
+            return
+        self.ensure()
+        self.session.execute(db.update(IdCounter).where(IdCounter.name == COUNTER_NAME).values(value=0))
+
+
+def highest_voter_number():
+    """The highest ``OBUSLG`` number in the registry, or 0."""
+    # A range on voter_id is the index-friendly form of LIKE 'OBUSLG%'
+    numbers = (obuslg_number(voter_id) for (voter_id,) in db.session.execute(
+        db.select(Voter.voter_id).where(Voter.voter_id >= VOTER_ID_PREFIX, Voter.voter_id < 'OBUSLH')))
+    return max((n for n in numbers if n is not None), default=0)
+
+
+def sync_voter_number_counter():
+    """Create the counter and move it past the highest ``OBUSLG`` number in use.
+
+    Run at startup so databases that predate the counter, or voters added
+    by hand, do not make it hand out taken numbers. Commits.
+    """
+    sequence = VoterNumberSequence()
+    sequence.ensure()
+    highest = highest_voter_number()
+    if highest:
+        sequence.advance(highest)
+    db.session.commit()
+    return highest
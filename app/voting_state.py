@@ -0,0 +1,97 @@
+"""Per-worker cache of the voting open/closed state.
+
+The ``voting_open`` and ``voting_until`` settings are read in one query,
+parsed into an immutable :class:`VotingState` and cached on the app for
+``VOTING_STATE_TTL`` seconds. ``voting_control`` bumps the ``voting_state``
+version counter, which every worker checks with a ``stat()`` on each read,
+so an open/close is seen everywhere on the node immediately.
+"""
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from flask import current_app
+
+from . import db, versions
+from .models import Setting
+
+VERSION_NAME = 'voting_state'
+DEFAULT_TTL = 5.0
+
+
+@dataclass(frozen=True)
+class VotingState:
+    open: bool
+    until: Optional[datetime]
+    version: int
+    loaded_at: float
+
+    @property
+    def expired(self):
+        return self.until is not None and datetime.utcnow() > self.until
+
+    @property
+    def is_open(self):
+        return self.open and not self.expired
+
+    def to_dict(self):
+        return {
+            'voting_open': self.is_open,
+            'voting_until': self.until.isoformat() if self.until and not self.expired else None,
+        }
+
+
+def _cache():
+    return current_app.extensions.setdefault('voting_state_cache', {})
+
+
+def _load(version):
+    settings = {s.key: s.value for s in
+                Setting.query.filter(Setting.key.in_(['voting_open', 'voting_until']))}
+    until = None
+    if settings.get('voting_until'):
+        try:
+            until = datetime.fromisoformat(settings['voting_until'])
+        except ValueError:
+            # If parsing fails, don't auto-close
+            until = None
+    return VotingState(open=settings.get('voting_open') == 'true', until=until,
+                       version=version, loaded_at=time.monotonic())
+
+
+def _close_expired():
+    """Persist an auto-close once the ``voting_until`` deadline has passed."""
+    try:
+        vs = Setting.query.filter_by(key='voting_open').first()
+        if vs:
+            vs.value = 'false'
+        Setting.query.filter_by(key='voting_until').delete()
+        db.session.commit()
+        versions.bump(VERSION_NAME)
+    except Exception as e:
+        db.session.rollback()
+        print(f"Failed to auto-close voting: {e}")
+
+
+def get_voting_state():
+    """Return the current :class:`VotingState`, hitting the database only on change or TTL expiry."""
+    cache = _cache()
+    version = versions.current(VERSION_NAME)
+    ttl = current_app.config.get('VOTING_STATE_TTL', DEFAULT_TTL)
+    state = cache.get('state')
+
+    if state is None or state.version != version or time.monotonic() - state.loaded_at > ttl:
+        state = _load(version)
+        if state.open and state.expired:
+            _close_expired()
+            state = _load(versions.current(VERSION_NAME))
+        cache['state'] = state
+
+    return state
+
+
+def invalidate_voting_state():
+    """Drop cached state in every worker after the voting settings change."""
+    _cache().pop('state', None)
+    versions.bump(VERSION_NAME)
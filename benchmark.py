@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+SLGS OBU Voting System - Performance Benchmarks
+Runs against a throwaway SQLite database unless BENCH_DATABASE_URL is set
+(e.g. a disposable PostgreSQL database - it will be wiped).
+
+Usage: python benchmark.py [benchmark-name ...]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+# Add current directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_app():
+    """Create an app bound to a fresh benchmark database."""
+    workdir = tempfile.mkdtemp()
+    database_url = os.environ.get('BENCH_DATABASE_URL')
+    if not database_url:
+        database_url = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ['DATABASE_URL'] = database_url
+
+    from app import create_app, db
+    from app.routes import main, admin
+
+    app = create_app()
+    # Keep version counters and the rate-limit store out of the working tree
+    app.config['VERSIONS_DIR'] = os.path.join(workdir, 'versions')
+    app.config['RATE_LIMIT_DB'] = os.path.join(workdir, 'ratelimit.db')
+    app.register_blueprint(main)
+    app.register_blueprint(admin)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    return app
+
+
+def seed_election(positions, candidates_per_position, voters, ballots):
+    """Bulk-load an election. Must run inside an app context."""
+    import random
+    from app import db
+    from app.models import Candidate, Position, Vote, Voter
+    from app.tally import rebuild_tallies
+
+    db.session.execute(db.insert(Position), [
+        {'name': f'Position {p}', 'voting_enabled': True} for p in range(positions)
+    ])
+    position_ids = [row[0] for row in db.session.execute(db.select(Position.id))]
+    db.session.execute(db.insert(Candidate), [
+        {'name': f'Candidate {p}-{c}', 'position_id': pid}
+        for p, pid in enumerate(position_ids) for c in range(candidates_per_position)
+    ])
+    by_position = {}
+    for cid, pid in db.session.execute(db.select(Candidate.id, Candidate.position_id)):
+        by_position.setdefault(pid, []).append(cid)
+
+    db.session.execute(db.insert(Voter), [
+        {'member_id': f'M{n:07d}', 'full_name': f'Member {n}', 'phone_number': '0770000000',
+         'voter_id': f'OBUSLG{n:03d}', 'voting_token': f'{n:08d}', 'has_voted': n <= ballots}
+        for n in range(1, voters + 1)
+    ])
+    voter_ids = [row[0] for row in db.session.execute(
+        db.select(Voter.id).where(Voter.has_voted == True).order_by(Voter.id))]  # noqa: E712
+    rows = [
+        {'voter_id': vid, 'position_id': pid, 'candidate_id': random.choice(cids)}
+        for vid in voter_ids for pid, cids in by_position.items()
+    ]
+    for start in range(0, len(rows), 5000):
+        db.session.execute(db.insert(Vote), rows[start:start + 5000])
+    rebuild_tallies()
+    db.session.commit()
+
+
+def bench_results_queries():
+    """Queries per results computation as candidates and ballots grow."""
+    from app import db
+    from app.querycount import count_queries
+    from app.results import election_results
+
+    print(f"{'candidates':>10} {'ballots':>8} {'queries':>8} {'ms':>8}")
+    for candidates_per_position, ballots in [(2, 100), (5, 1000), (10, 5000), (20, 20000)]:
+        app = make_app()
+        with app.app_context():
+            seed_election(12, candidates_per_position, ballots, ballots)
+            db.session.expire_all()
+            start = time.perf_counter()
+            with count_queries(db.engine) as counter:
+                election_results()
+            elapsed = (time.perf_counter() - start) * 1000
+            print(f"{12 * candidates_per_position:>10} {ballots:>8} {counter.count:>8} {elapsed:>8.2f}")
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def _legacy_record_ballot(voter, selections):
+    """The pre-bulk write path: a Candidate lookup and an ORM Vote per selection."""
+    from app import db
+    from app.models import Candidate, Vote
+    from app.tally import increment_tallies
+
+    for position_id, candidate_id in selections:
+        candidate = db.session.get(Candidate, candidate_id)
+        db.session.add(Vote(voter_id=voter.id, candidate_id=candidate.id, position_id=position_id))
+    voter.has_voted = True
+    increment_tallies(candidate_id for _, candidate_id in selections)
+    db.session.commit()
+
+
+def bench_ballot_commit():
+    """Ballot write latency: per-row ORM inserts vs one multi-row insert."""
+    import random
+    from app import db
+    from app.ballot import get_ballot, record_ballot
+    from app.models import Voter
+
+    ballots = 300
+    print(f"{'path':>8} {'ballots':>8} {'p50 ms':>8} {'p95 ms':>8} {'ballots/s':>10}")
+    for label, writer in [('legacy', _legacy_record_ballot), ('bulk', record_ballot)]:
+        app = make_app()
+        with app.app_context():
+            seed_election(12, 4, ballots, 0)
+            ballot = get_ballot()
+            voters = Voter.query.order_by(Voter.id).all()
+            samples = []
+            for voter in voters:
+                selections = [(p.id, random.choice(p.candidates).id) for p in ballot.positions]
+                start = time.perf_counter()
+                writer(voter, selections)
+                samples.append((time.perf_counter() - start) * 1000)
+            total = sum(samples) / 1000
+            print(f"{label:>8} {ballots:>8} {_percentile(samples, 50):>8.2f} "
+                  f"{_percentile(samples, 95):>8.2f} {ballots / total:>10.0f}")
+
+
+def bench_rate_limiter():
+    """Rate limiter checks per second across 100k distinct keys."""
+    from app.ratelimit import MemoryRateLimiter, SQLiteRateLimiter
+
+    keys = [f'10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}' for n in range(100000)]
+    backends = [
+        ('memory', MemoryRateLimiter(10, 300, max_keys=65536)),
+        ('sqlite', SQLiteRateLimiter(os.path.join(tempfile.mkdtemp(), 'rl.db'), 10, 300, max_keys=65536)),
+    ]
+    print(f"{'backend':>8} {'checks':>8} {'checks/s':>10} {'stored keys':>12}")
+    for label, limiter in backends:
+        start = time.perf_counter()
+        for key in keys:
+            limiter.hit(key)
+        elapsed = time.perf_counter() - start
+        print(f"{label:>8} {len(keys):>8} {len(keys) / elapsed:>10.0f} {len(limiter):>12}")
+
+
+def bench_ballot_journal():
+    """Sustained ballots per second with the write-behind journal off and on."""
+    import random
+    from app import db
+    from app.ballot import get_ballot, record_ballot
+    from app.journal import init_journal
+    from app.models import Vote, Voter
+
+    ballots = 1000
+    print(f"{'journal':>8} {'ballots':>8} {'accepted/s':>11} {'drained/s':>10}")
+    for enabled in (False, True):
+        app = make_app()
+        with app.app_context():
+            seed_election(12, 4, ballots, 0)
+            journal = None
+            if enabled:
+                app.config['BALLOT_JOURNAL_DIR'] = tempfile.mkdtemp()
+                journal = init_journal(app)
+            ballot = get_ballot()
+            voters = Voter.query.order_by(Voter.id).all()
+
+            start = time.perf_counter()
+            for voter in voters:
+                selections = [(p.id, random.choice(p.candidates).id) for p in ballot.positions]
+                record_ballot(voter, selections)
+            accepted = time.perf_counter() - start
+            if journal is not None:
+                journal.stop()
+            drained = time.perf_counter() - start
+
+            assert Vote.query.count() == ballots * len(ballot.positions)
+            print(f"{'on' if enabled else 'off':>8} {ballots:>8} {ballots / accepted:>11.0f} {ballots / drained:>10.0f}")
+            if journal is not None:
+                app.extensions.pop('ballot_journal')
+
+
+def _swap_letters(rng, word):
+    """``word`` with two adjacent letters swapped - a typical typing slip."""
+    i = rng.randrange(1, len(word) - 2)
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+def bench_voter_search():
+    """Voter search index build time and query latency at 100k voters."""
+    import random
+    from app import db
+    from app.models import Voter
+    from app.search import build_voter_index
+
+    first = ['Mohamed', 'Fatmata', 'Ibrahim', 'Aminata', 'Abdul', 'Mariama', 'Joseph', 'Isatu', 'Samuel', 'Hawa']
+    last = ['Kamara', 'Sesay', 'Koroma', 'Bangura', 'Conteh', 'Turay', 'Jalloh', 'Kargbo', 'Mansaray', 'Fofanah']
+    rng = random.Random(42)
+    app = make_app()
+    with app.app_context():
+        rows = [
+            {'member_id': f'M{n:07d}', 'full_name': f'{rng.choice(first)} {rng.choice(last)} {n}',
+             'phone_number': f'+232 7{rng.randint(0, 9)} {rng.randint(0, 999999):06d}',
+             'voter_id': f'OBUSLG{n:06d}', 'voting_token': f'{n:08d}'}
+            for n in range(1, 100001)
+        ]
+        for start in range(0, len(rows), 10000):
+            db.session.execute(db.insert(Voter), rows[start:start + 10000])
+        db.session.commit()
+
+        start = time.perf_counter()
+        index = build_voter_index()
+        print(f"build: {len(index)} voters in {time.perf_counter() - start:.2f}s")
+
+        queries = [
+            ('exact name', [rows[rng.randrange(len(rows))]['full_name'] for _ in range(200)]),
+            ('typo name', [' '.join(_swap_letters(rng, word) for word in rows[rng.randrange(len(rows))]['full_name'].split()[:2])
+                           for _ in range(200)]),
+            ('member id', [rows[rng.randrange(len(rows))]['member_id'].lower() for _ in range(200)]),
+            ('phone', [rows[rng.randrange(len(rows))]['phone_number'][5:] for _ in range(200)]),
+        ]
+        print(f"{'query':>12} {'p50 ms':>8} {'p99 ms':>8}")
+        for label, terms in queries:
+            samples = []
+            for term in terms:
+                begin = time.perf_counter()
+                index.search(term)
+                samples.append((time.perf_counter() - begin) * 1000)
+            print(f"{label:>12} {_percentile(samples, 50):>8.2f} {_percentile(samples, 99):>8.2f}")
+
+
+def bench_ballot_export():
+    """Peak Python memory of the streamed ballot audit export as vote rows grow."""
+    import tracemalloc
+    from app.exports import ballot_rows, csv_chunks, gzip_chunks
+
+    print(f"{'votes':>8} {'bytes out':>10} {'seconds':>8} {'peak MiB':>9}")
+    for ballots in (1000, 100000):
+        app = make_app()
+        with app.app_context():
+            seed_election(positions=5, candidates_per_position=4, voters=ballots, ballots=ballots)
+            tracemalloc.start()
+            start = time.perf_counter()
+            size = sum(len(chunk) for chunk in gzip_chunks(csv_chunks(ballot_rows('bench-secret'))))
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"{ballots * 5:>8} {size:>10} {elapsed:>8.2f} {peak / 2 ** 20:>9.2f}")
+
+
+def _legacy_voting_token():
+    """The former ``Voter.generate_voting_token``: one SELECT per random draw."""
+    import secrets
+    import string
+    from app.models import Voter
+
+    while True:
+        voting_token = ''.join(secrets.choice(string.digits) for _ in range(8))
+        if not Voter.query.filter_by(voting_token=voting_token).first():
+            return voting_token
+
+
+def _legacy_import(rows):
+    """The pre-bulk upload loop: a duplicate check, ID scan and token query per row."""
+    from app import db
+    from app.models import Voter
+
+    for member_id, full_name, phone_number in rows:
+        if Voter.query.filter_by(member_id=member_id).first():
+            continue
+        voter = Voter(member_id=member_id, full_name=full_name, phone_number=phone_number)
+        voter.generate_voter_id()
+        voter.voting_token = _legacy_voting_token()
+        db.session.add(voter)
+    db.session.commit()
+
+
+def bench_voter_import():
+    """CSV voter import time: per-row legacy path vs the set-based importer, and an upsert of changed rows."""
+    from app import db
+    from app.importer import VoterImporter
+    from app.models import Voter
+
+    def make_rows(count, offset=0):
+        # Every tenth member ID collides with a voter ID, exercising the OBUSLG fallback
+        return [(f'OBUSLG{n:03d}' if n % 10 == 0 else f'M{n:07d}', f'Member {n}', f'+232 76 {n:06d}')
+                for n in range(offset, offset + count)]
+
+    print(f"{'path':>8} {'rows':>8} {'seconds':>8} {'rows/s':>9}")
+    for label, count in (('legacy', 2000), ('bulk', 2000), ('bulk', 50000), ('upsert', 50000)):
+        app = make_app()
+        with app.app_context():
+            # An existing registry of 5k voters to check against
+            VoterImporter().import_rows(make_rows(5000, offset=1000000))
+            db.session.commit()
+            rows = make_rows(count)
+            if label == 'upsert':
+                # Re-import the same members with every other name corrected
+                VoterImporter().import_rows(rows)
+                db.session.commit()
+                rows = [(m, f'{name} Corrected' if n % 2 else name, phone) for n, (m, name, phone) in enumerate(rows)]
+
+            start = time.perf_counter()
+            if label == 'legacy':
+                _legacy_import(rows)
+            elif label == 'upsert':
+                VoterImporter(upsert=True).import_rows(rows)
+                db.session.commit()
+            else:
+                VoterImporter().import_rows(rows)
+                db.session.commit()
+            elapsed = time.perf_counter() - start
+            assert Voter.query.count() == 5000 + count
+            print(f"{label:>8} {count:>8} {elapsed:>8.2f} {count / elapsed:>9.0f}")
+
+
+def bench_voter_tokens():
+    """Voting token allocation: the former query-per-attempt generator vs the batch allocator."""
+    from app import db
+    from app.importer import TokenAllocator, VoterImporter, load_registry_keys
+
+    app = make_app()
+    with app.app_context():
+        # An existing registry of 100k voters to avoid
+        VoterImporter().import_rows((f'T{n:07d}', f'Member {n}', '076000000') for n in range(100000))
+        db.session.commit()
+
+        count = 2000
+        start = time.perf_counter()
+        for _ in range(count):
+            _legacy_voting_token()
+        legacy = time.perf_counter() - start
+
+        for batch in (2000, 100000):
+            start = time.perf_counter()
+            _, _, taken = load_registry_keys()
+            tokens = TokenAllocator(taken).allocate_many(batch)
+            elapsed = time.perf_counter() - start
+            assert len(set(tokens)) == batch
+
+            if batch == count:
+                print(f"{'path':>8} {'tokens':>8} {'seconds':>8} {'tokens/s':>10}")
+                print(f"{'legacy':>8} {count:>8} {legacy:>8.3f} {count / legacy:>10.0f}")
+            print(f"{'batch':>8} {batch:>8} {elapsed:>8.3f} {batch / elapsed:>10.0f}")
+
+
+BENCHMARKS = {
+    'results-queries': bench_results_queries,
+    'ballot-commit': bench_ballot_commit,
+    'rate-limiter': bench_rate_limiter,
+    'ballot-journal': bench_ballot_journal,
+    'voter-search': bench_voter_search,
+    'ballot-export': bench_ballot_export,
+    'voter-import': bench_voter_import,
+    'voter-tokens': bench_voter_tokens,
+}
+
+
+def main():
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark: {name}. Available: {', '.join(BENCHMARKS)}")
+            return False
+    for name in names:
+        print(f"\n== {name}: {BENCHMARKS[name].__doc__}")
+        BENCHMARKS[name]()
+    return True
+
+
+if __name__ == '__main__':
+    success = main()
+    sys.exit(0 if success else 1)
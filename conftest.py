@@ -0,0 +1,82 @@
+"""Shared pytest fixtures: a fresh SQLite-backed app per test."""
+
+import os
+import sys
+
+import pytest
+
+# Add current directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'test.db'}")
+    monkeypatch.setenv('ELECTION_POSITIONS', 'President,Secretary')
+
+    from app import create_app, db
+    from app.routes import main, admin
+
+    app = create_app()
+    app.config['TESTING'] = True
+    app.config['VERSIONS_DIR'] = str(tmp_path / 'versions')
+    app.config['RATE_LIMIT_DB'] = str(tmp_path / 'ratelimit.db')
+    app.config['IMPORT_DIR'] = str(tmp_path / 'imports')
+    app.config['IMPORT_WORKERS'] = 0  # import inside the upload request unless a test opts in
+    app.register_blueprint(main)
+    app.register_blueprint(admin)
+
+    yield app
+
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def election(app):
+    """Open voting with two positions, two candidates each and three voters."""
+    from app import db
+    from app.models import Candidate, Position, Setting, Voter
+    from app.tally import ensure_tally
+
+    with app.app_context():
+        positions = Position.query.order_by(Position.id).all()
+        candidates = {}
+        for position in positions:
+            for suffix in ('A', 'B'):
+                cand = Candidate(name=f'{position.name} {suffix}', position_id=position.id)
+                db.session.add(cand)
+                db.session.flush()
+                ensure_tally(cand.id)
+                candidates[cand.name] = cand.id
+
+        voters = []
+        for n in range(1, 4):
+            voter = Voter(member_id=f'M{n:03d}', full_name=f'Member {n}', phone_number='0770000000',
+                          voter_id=f'OBUSLG{n:03d}', voting_token=f'{n:08d}')
+            db.session.add(voter)
+            voters.append((voter.voter_id, voter.voting_token))
+
+        db.session.add(Setting(key='voting_open', value='true'))
+        db.session.commit()
+
+        return {
+            'positions': {p.name: p.id for p in positions},
+            'candidates': candidates,
+            'voters': voters,
+        }
+
+
+def cast_ballot(client, election, voter_index, choices):
+    """POST a ballot; ``choices`` maps position name to candidate name."""
+    voter_id, token = election['voters'][voter_index]
+    form = {'voter_id': voter_id, 'voting_token': token}
+    for position_name, candidate_name in choices.items():
+        form[f"position_{election['positions'][position_name]}"] = str(election['candidates'][candidate_name])
+    return client.post('/vote', data=form)
@@ -129,6 +129,20 @@ if __name__ == "__main__":
     # Then run the migration
     success = migrate_database()
 
+    # Finally add any hot-path indexes missing from older databases
+    try:
+        from app.migrations import apply_index_migration
+
+        app = create_app()
+        with app.app_context():
+            created, skipped = apply_index_migration()
+        print(f"✅ Indexes created: {', '.join(created) or 'none needed'}")
+        if skipped:
+            print(f"⚠️ Indexes skipped (resolve duplicate votes first): {', '.join(skipped)}")
+    except Exception as e:
+        print(f"❌ Index migration error: {e}")
+        success = False
+
     if success:
         print("\n🎉 Migration completed successfully!")
         print("The voting system should now work properly.")
@@ -0,0 +1,40 @@
+"""Tests for the JSON results API."""
+
+from conftest import cast_ballot
+
+
+def test_results_api_payload(client, election):
+    cast_ballot(client, election, 0, {'President': 'President A'})
+
+    response = client.get('/api/results')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['api_version'] == 1
+    assert data['voted_count'] == 1 and data['total_voters'] == 3
+    president = data['positions'][0]
+    assert president['name'] == 'President'
+    assert {c['name']: c['votes'] for c in president['candidates']} == {'President A': 1, 'President B': 0}
+
+
+def test_unchanged_results_answer_304_without_queries(app, client, election):
+    from app import db
+    from app.querycount import count_queries
+
+    etag = client.get('/api/results').headers['ETag']
+    assert not etag.startswith('W/')
+
+    with app.app_context():
+        with count_queries(db.engine) as counter:
+            response = client.get('/api/results', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+    assert counter.count == 0
+
+
+def test_ballot_changes_etag(client, election):
+    etag = client.get('/api/results').headers['ETag']
+    cast_ballot(client, election, 0, {'Secretary': 'Secretary A'})
+
+    response = client.get('/api/results', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
@@ -0,0 +1,77 @@
+"""Tests for the cached ballot snapshot."""
+
+from conftest import cast_ballot
+
+ADMIN = {'Authorization': 'Bearer admin-token'}
+
+
+def test_vote_page_uses_cached_ballot(app, client, election):
+    from app import db
+    from app.querycount import count_queries
+
+    assert client.get('/vote').status_code == 200
+
+    with app.app_context():
+        with count_queries(db.engine) as counter:
+            page = client.get('/vote')
+    assert page.status_code == 200
+    assert b'President A' in page.data
+    assert counter.count == 0
+
+
+def test_candidate_from_other_position_is_ignored(app, client, election):
+    from app.models import Vote
+
+    voter_id, token = election['voters'][0]
+    response = client.post('/vote', data={
+        'voter_id': voter_id,
+        'voting_token': token,
+        f"position_{election['positions']['President']}": str(election['candidates']['Secretary A']),
+    })
+    assert response.status_code == 302
+
+    with app.app_context():
+        assert Vote.query.count() == 0
+
+
+def test_ballot_changes_invalidate_snapshot(app, client, election):
+    president = election['positions']['President']
+
+    client.post(f'/admin/positions/{president}/toggle-voting', headers=ADMIN)
+    assert b'President A' not in client.get('/vote').data
+
+    client.post(f'/admin/positions/{president}/toggle-voting', headers=ADMIN)
+    client.post('/admin/candidates', json={'name': 'Late Entrant', 'position_id': president}, headers=ADMIN)
+    page = client.get('/vote').data
+    assert b'President A' in page and b'Late Entrant' in page
+
+
+def test_ballot_post_records_votes(app, client, election):
+    from app.models import Vote
+
+    cast_ballot(client, election, 0, {'President': 'President B', 'Secretary': 'Secretary A'})
+
+    with app.app_context():
+        assert sorted(v.candidate_id for v in Vote.query.all()) == sorted(
+            [election['candidates']['President B'], election['candidates']['Secretary A']])
+
+
+def test_null_voting_enabled_counts_as_enabled_everywhere(app, client, election):
+    from app import db
+    from app.ballot import get_ballot, invalidate_ballot
+    from app.models import Position
+    from app.results import election_results
+
+    president = election['positions']['President']
+    with app.app_context():
+        db.session.execute(db.update(Position).where(Position.id == president).values(voting_enabled=None))
+        db.session.commit()
+        invalidate_ballot()
+
+        assert president in [p.id for p in get_ballot().positions]
+        result = next(p for p in election_results().positions if p.id == president)
+        assert result.voting_enabled is True
+
+    # Toggling a NULL position disables it rather than leaving it enabled
+    response = client.post(f'/admin/positions/{president}/toggle-voting', headers=ADMIN)
+    assert response.get_json()['voting_enabled'] is False
@@ -0,0 +1,57 @@
+"""Concurrency stress tests for the ballot write path."""
+
+import threading
+
+SUBMISSIONS = 24
+
+
+def _submit_in_parallel(app, forms):
+    barrier = threading.Barrier(len(forms))
+    statuses = []
+
+    def submit(n, form):
+        client = app.test_client()
+        barrier.wait()
+        response = client.post('/vote', data=form, environ_base={'REMOTE_ADDR': f'10.0.0.{n}'})
+        statuses.append(response.status_code)
+
+    threads = [threading.Thread(target=submit, args=(n, form)) for n, form in enumerate(forms)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return statuses
+
+
+def _form(election, voter_index, candidate_name):
+    voter_id, token = election['voters'][voter_index]
+    return {
+        'voter_id': voter_id,
+        'voting_token': token,
+        f"position_{election['positions']['President']}": str(election['candidates'][candidate_name]),
+    }
+
+
+def test_parallel_submissions_for_one_voter_land_one_ballot(app, election):
+    from app.models import CandidateTally, Vote, Voter
+
+    forms = [_form(election, 0, 'President A' if n % 2 else 'President B') for n in range(SUBMISSIONS)]
+    statuses = _submit_in_parallel(app, forms)
+    assert statuses == [302] * SUBMISSIONS
+
+    with app.app_context():
+        voter = Voter.query.filter_by(voter_id=election['voters'][0][0]).one()
+        assert voter.has_voted is True
+        assert Vote.query.filter_by(voter_id=voter.id).count() == 1
+        assert sum(t.votes for t in CandidateTally.query.all()) == 1
+
+
+def test_parallel_submissions_for_different_voters_all_land(app, election):
+    from app.models import Vote, Voter
+
+    forms = [_form(election, n, 'President A') for n in range(3)]
+    _submit_in_parallel(app, forms)
+
+    with app.app_context():
+        assert Voter.query.filter_by(has_voted=True).count() == 3
+        assert Vote.query.count() == 3
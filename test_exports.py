@@ -0,0 +1,63 @@
+"""Tests for the streaming CSV exports."""
+
+import csv
+import gzip
+import io
+
+from conftest import cast_ballot
+
+ADMIN = {'Authorization': 'Bearer admin-token'}
+
+
+def test_summary_export_streams_tallies(client, election):
+    cast_ballot(client, election, 0, {'President': 'President A', 'Secretary': 'Secretary B'})
+    cast_ballot(client, election, 1, {'President': 'President A'})
+
+    response = client.get('/admin/export-results', headers=ADMIN)
+    assert response.is_streamed
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert rows[0] == ['Position', 'Candidate', 'Votes']
+    assert ['President', 'President A', '2'] in rows
+    assert ['Secretary', 'Secretary A', '0'] in rows
+
+
+def test_ballot_export_groups_ballots_without_naming_voters(client, election):
+    cast_ballot(client, election, 0, {'President': 'President A', 'Secretary': 'Secretary B'})
+    cast_ballot(client, election, 2, {'President': 'President B'})
+
+    body = client.get('/admin/export-ballots', headers=ADMIN).get_data(as_text=True)
+    rows = list(csv.DictReader(io.StringIO(body)))
+    assert [(r['Position'], r['Candidate']) for r in rows] == [
+        ('President', 'President A'), ('Secretary', 'Secretary B'), ('President', 'President B')]
+    assert rows[0]['Ballot'] == rows[1]['Ballot'] != rows[2]['Ballot']
+    for voter_id, token in election['voters']:
+        assert voter_id not in body and token not in body
+
+
+def test_gzip_ballot_export_spans_many_chunks(app, client, election):
+    from app import db
+    from app.exports import CHUNK_SIZE
+    from app.models import Vote, Voter
+
+    with app.app_context():
+        db.session.execute(db.insert(Voter), [
+            {'member_id': f'B{n}', 'full_name': f'Bulk {n}', 'phone_number': '0',
+             'voter_id': f'BULK{n}', 'voting_token': f'9{n:07d}'} for n in range(2500)])
+        voter_ids = [row[0] for row in db.session.execute(db.select(Voter.id).where(Voter.member_id.like('B%')))]
+        db.session.execute(db.insert(Vote), [
+            {'voter_id': voter_id, 'position_id': election['positions'][name],
+             'candidate_id': election['candidates'][f'{name} A']}
+            for voter_id in voter_ids for name in ('President', 'Secretary')])
+        db.session.commit()
+
+    response = client.get('/admin/export-ballots?gzip=1', headers=ADMIN)
+    assert response.mimetype == 'application/gzip'
+    assert response.headers['Content-disposition'].endswith('.csv.gz')
+    text = gzip.decompress(response.get_data()).decode('utf-8')
+    assert len(text) > 2 * CHUNK_SIZE
+    assert len(text.splitlines()) == 5001
+
+
+def test_exports_require_admin(client):
+    assert client.get('/admin/export-results').status_code == 401
+    assert client.get('/admin/export-ballots').status_code == 401
@@ -0,0 +1,49 @@
+"""Tests for the rendered-fragment cache."""
+
+import threading
+import time
+
+from conftest import cast_ballot
+
+ADMIN = {'Authorization': 'Bearer admin-token'}
+
+
+def test_dashboard_renders_once_per_results_version(client, election):
+    for _ in range(3):
+        assert b'President A' in client.get('/dashboard').data
+    stats = client.get('/admin/cache-stats', headers=ADMIN).get_json()['dashboard_fragments']
+    assert (stats['misses'], stats['hits']) == (1, 2)
+
+    cast_ballot(client, election, 0, {'President': 'President A'})
+    client.get('/dashboard')
+    stats = client.get('/admin/cache-stats', headers=ADMIN).get_json()['dashboard_fragments']
+    assert stats['misses'] == 2
+
+
+def test_concurrent_misses_render_once():
+    from app.fragment_cache import FragmentCache
+
+    cache = FragmentCache()
+    renders = []
+
+    def render():
+        renders.append(1)
+        time.sleep(0.05)
+        return '<div>results</div>'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_render(('dashboard', 7), render)))
+               for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(renders) == 1
+    assert results == ['<div>results</div>'] * 20
+    stats = cache.stats()
+    assert stats['misses'] == 1 and stats['hits'] + stats['coalesced'] == 19
+
+
+def test_cache_stats_require_admin(client):
+    assert client.get('/admin/cache-stats').status_code == 401
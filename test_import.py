@@ -0,0 +1,294 @@
+"""Tests for the set-based bulk voter import."""
+
+import csv
+import io
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+ADMIN = {'Authorization': 'Bearer admin-token'}
+
+
+def _upload(client, text):
+    return client.post('/admin/upload-voters', headers=ADMIN, content_type='multipart/form-data',
+                       data={'file': (io.BytesIO(text.encode('utf-8')), 'voters.csv')})
+
+
+def test_import_validates_skips_and_allocates(app, client, election):
+    from app.models import Voter
+
+    response = _upload(client, '\n'.join([
+        'MemberID,FullName,Phone,Token',
+        'N001,New One,076111111,12345678',     # supplied token
+        'N002,New Two,076222222,abc',          # bad token -> generated
+        'N003,New Three,076333333,12345678',   # token taken by N001 -> generated
+        'M001,Existing Member,076444444',      # already registered
+        'N001,Repeat In File,076555555',       # repeated within the file
+        'N004,,076666666',                     # missing name
+        'N005,No Digits,none',                 # bad phone
+        '',
+        'OBUSLG001,Takes An Existing Id,076777777',
+    ]))
+    data = response.get_json()
+    assert response.status_code == 202 and data['status'] == 'completed'
+    assert (data['added'], data['skipped'], data['invalid']) == (4, 2, 2)
+    assert len(data['errors']) == 4
+
+    with app.app_context():
+        voters = {v.member_id: v for v in Voter.query.all()}
+    assert voters['N001'].voter_id == 'N001' and voters['N001'].voting_token == '12345678'
+    assert voters['N002'].voting_token.isdigit() and len(voters['N002'].voting_token) == 8
+    assert voters['N003'].voting_token != '12345678'
+    # OBUSLG001 is taken by the election fixture, so the next free number after the highest is used
+    assert voters['OBUSLG001'].voter_id == 'OBUSLG004'
+    tokens = [v.voting_token for v in voters.values()]
+    assert len(tokens) == len(set(tokens))
+
+
+def test_import_round_trips_do_not_grow_with_rows(app, client, election):
+    from app import db
+    from app.querycount import count_queries
+
+    def queries(first, count):
+        rows = '\n'.join(f'B{n},Bulk {n},07600{n:04d}' for n in range(first, first + count))
+        with app.app_context(), count_queries(db.engine) as counter:
+            assert _upload(client, 'MemberID,FullName,Phone\n' + rows).get_json()['added'] == count
+        return counter.count
+
+    assert queries(0, 5) == queries(100, 900)
+
+
+def _wait_for_job(client, status_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while True:
+        job = client.get(status_url, headers=ADMIN).get_json()
+        if job['status'] not in ('queued', 'running') or time.monotonic() > deadline:
+            return job
+        time.sleep(0.05)
+
+
+def test_upload_runs_as_background_job(app, client, election):
+    app.config['IMPORT_WORKERS'] = 2
+    app.config['IMPORT_COMMIT_ROWS'] = 100
+    good = ''.join(f'J{n},Job Member {n},076{n:06d}\n' for n in range(450))
+    bad = ''.join(f'X{n},,076000000\n' for n in range(15))
+
+    response = _upload(client, 'MemberID,FullName,Phone\n' + good + bad)
+    assert response.status_code == 202
+    status_url = response.get_json()['status_url']
+    assert status_url == f"/admin/import-jobs/{response.get_json()['job_id']}"
+
+    job = _wait_for_job(client, status_url)
+    assert job['status'] == 'completed'
+    assert (job['rows_read'], job['added'], job['invalid']) == (465, 450, 15)
+    assert job['rows_per_second'] > 0 and job['finished_at']
+    # The job keeps every row error, not just the first few
+    assert job['error_count'] == len(job['errors']) == 15 and not job['errors_truncated']
+    # The spooled upload is removed; only the row report is kept
+    assert os.listdir(app.config['IMPORT_DIR']) == [f"{job['job_id']}-report.csv"]
+
+
+def test_import_job_status_auth_and_staleness(app, client, election):
+    from app import db
+    from app.models import ImportJob
+
+    job_id = _upload(client, 'MemberID,FullName,Phone\nS1,Stale One,076000001\n').get_json()['job_id']
+    assert client.get(f'/admin/import-jobs/{job_id}').status_code == 401
+    assert client.get('/admin/import-jobs/missing', headers=ADMIN).status_code == 404
+
+    # A job whose worker died stops updating its row and is reported as interrupted
+    with app.app_context():
+        job = db.session.get(ImportJob, job_id)
+        job.status, job.finished_at = 'running', None
+        job.updated_at = datetime.utcnow() - timedelta(hours=1)
+        db.session.commit()
+    data = client.get(f'/admin/import-jobs/{job_id}', headers=ADMIN).get_json()
+    assert data['status'] == 'interrupted' and '1 voters were saved' in data['error']
+
+
+def test_dry_run_reports_every_problem_without_writing(app, client, election):
+    from app import db
+    from app.models import IdCounter, Voter
+
+    with app.app_context():
+        voters_before = Voter.query.count()
+        counter_before = db.session.get(IdCounter, 'voter_number').value
+    rows = [
+        'D001,Good One,076000001',
+        'D002,Good Two,076000002,12345678',
+        'D003,Token Reused,076000003,12345678',   # warning: token taken earlier in the file
+        'D001,Repeated,076000004',               # skipped: repeated in the file
+        'M001,Registered,076000005',             # skipped: already registered
+        'D004,Bad Token,076000006,12ab',         # warning: bad token format
+    ] + [f'X{n},,076000000' for n in range(20)]  # invalid: missing name
+    response = client.post('/admin/upload-voters', headers=ADMIN, content_type='multipart/form-data',
+                           data={'file': (io.BytesIO(('MemberID,FullName,Phone,Token\n' + '\n'.join(rows)).encode()),
+                                          'voters.csv'),
+                                 'dry_run': '1'})
+    job = response.get_json()
+    assert job['status'] == 'completed' and job['dry_run']
+    assert (job['added'], job['skipped'], job['invalid'], job['error_count']) == (4, 2, 20, 22)
+    assert job['message'].startswith('Dry run: 4 voters would be added')
+
+    with app.app_context():
+        assert Voter.query.count() == voters_before
+        assert db.session.get(IdCounter, 'voter_number').value == counter_before
+
+    report = client.get(job['report_url'], headers=ADMIN)
+    assert report.status_code == 200 and report.mimetype == 'text/csv'
+    lines = list(csv.reader(io.StringIO(report.get_data(as_text=True))))
+    assert lines[0] == ['Row', 'Status', 'Message']
+    assert len(lines) - 1 == job['error_count'] + job['skipped']
+    statuses = {row: status for row, status, _ in lines[1:]}
+    assert (statuses['4'], statuses['5'], statuses['6'], statuses['7'], statuses['8']) == \
+        ('warning', 'skipped', 'skipped', 'warning', 'invalid')
+    assert client.get(job['report_url']).status_code == 401
+
+
+def test_header_without_required_columns_fails(client, election):
+    job = _upload(client, 'MemberID;FullName;Phone\nA1;Semicolons;076000001\n').get_json()
+    assert job['status'] == 'failed' and 'header' in job['error']
+
+
+def test_upsert_updates_registered_members(app, client, election):
+    from app.models import Voter
+
+    with app.app_context():
+        before = {v.member_id: (v.voter_id, v.voting_token) for v in Voter.query}
+    response = client.post('/admin/upload-voters?mode=upsert', headers=ADMIN, content_type='multipart/form-data',
+                           data={'file': (io.BytesIO('\n'.join([
+                               'MemberID,FullName,Phone',
+                               'M001,Member One Renamed,0770000000',   # name corrected
+                               'M002,Member 2,0770000000',             # identical
+                               'M003,Member 3,+232 76 000 003',        # phone corrected
+                               'U001,New Upserted,076000004',          # new member
+                               'M001,Repeated,0770000000',             # repeated in file
+                           ]).encode()), 'voters.csv')})
+    job = response.get_json()
+    assert job['status'] == 'completed' and job['mode'] == 'upsert'
+    assert (job['added'], job['updated'], job['unchanged'], job['skipped']) == (1, 2, 1, 1)
+    assert job['message'] == '1 voters added, 2 updated and 1 unchanged (1 duplicates skipped)'
+
+    with app.app_context():
+        voters = {v.member_id: v for v in Voter.query}
+        assert voters['M001'].full_name == 'Member One Renamed'
+        assert voters['M003'].phone_number == '+232 76 000 003'
+        assert voters['U001'].voter_id == 'U001'
+        # Credentials of registered members are never touched
+        assert all((voters[m].voter_id, voters[m].voting_token) == creds for m, creds in before.items())
+
+    found = client.get('/admin/voters/search?q=renamed', headers=ADMIN).get_json()
+    assert [v['full_name'] for v in found['voters']] == ['Member One Renamed']
+    assert client.post('/admin/upload-voters?mode=merge', headers=ADMIN, content_type='multipart/form-data',
+                       data={'file': (io.BytesIO(b'MemberID,FullName,Phone\n'), 'v.csv')}).status_code == 400
+
+
+def test_upsert_counts_come_from_the_database(app, election):
+    from app import db
+    from app.importer import VoterImporter
+    from app.models import Voter
+
+    with app.app_context():
+        importer = VoterImporter(upsert=True)
+        # Registered by another import after this one loaded the registry
+        db.session.add(Voter(member_id='LATE1', full_name='Late One', phone_number='076000001',
+                             voter_id='LATE1', voting_token='90000001'))
+        db.session.commit()
+        importer.import_rows([['LATE1', 'Late One Renamed', '076000001'], ['NEW1', 'New One', '076000002']])
+        db.session.commit()
+        assert (importer.added, importer.updated, importer.unchanged) == (1, 1, 0)
+        assert Voter.query.filter_by(member_id='LATE1').one().full_name == 'Late One Renamed'
+
+
+def test_upsert_round_trips_do_not_grow_with_rows(app, election):
+    from app import db
+    from app.importer import VoterImporter
+    from app.querycount import count_queries
+
+    with app.app_context():
+        VoterImporter().import_rows([f'R{n}', f'Registered {n}', '076000000'] for n in range(600))
+        db.session.commit()
+
+        def queries(first, count):
+            rows = [[f'R{n}', f'Renamed {n}', '076000000'] for n in range(first, first + count)]
+            with count_queries(db.engine) as counter:
+                importer = VoterImporter(upsert=True).import_rows(rows)
+                db.session.commit()
+            assert importer.updated == count
+            return counter.count
+
+        assert queries(0, 5) == queries(100, 500)
+
+
+def test_allocator_continues_obuslg_numbering():
+    from app.importer import VoterIdAllocator
+
+    allocator = VoterIdAllocator({'OBUSLG007', 'OBUSLGX', 'A1'})
+    assert allocator.allocate('A1') == 'OBUSLG008'
+    assert allocator.allocate('OBUSLG020') == 'OBUSLG020'
+    assert allocator.allocate('x' * 30) == 'OBUSLG021'
+    # Without a sequence a collision is skipped, not pushed to a counter
+    allocator.taken.add('OBUSLG022')
+    allocator.highest = 21
+    assert allocator.allocate_many(2) == ['OBUSLG023', 'OBUSLG024']
+
+
+def test_allocate_many_returns_fresh_unique_tokens():
+    from app.importer import TokenAllocator
+
+    taken = {f'{n:08d}' for n in range(0, 10 ** 8, 10 ** 5)}
+    existing = set(taken)
+    tokens = TokenAllocator(taken).allocate_many(5000)
+    assert len(set(tokens)) == 5000 and not existing & set(tokens)
+    assert all(len(token) == 8 and token.isdigit() for token in tokens)
+    assert taken == existing | set(tokens)
+
+
+def test_allocate_many_fills_a_nearly_full_space(monkeypatch):
+    from app import importer
+
+    monkeypatch.setattr(importer, 'TOKEN_SPACE', 100)
+    monkeypatch.setattr(importer, '_TOKEN_DRAW_LIMIT', (2 ** 32 // 100) * 100)
+    allocator = importer.TokenAllocator({f'{n:08d}' for n in range(10)})
+    assert sorted(allocator.allocate_many(90)) == [f'{n:08d}' for n in range(10, 100)]
+    with pytest.raises(ValueError):
+        allocator.allocate_many(1)
+
+
+def test_failed_chunk_keeps_earlier_and_later_chunks(app, election):
+    from app import db
+    from app.importer import VoterImporter
+    from app.models import Voter
+
+    def concurrent_import(importer):
+        # Another worker registers a member that appears in the third chunk
+        if importer.committed == 10 and not Voter.query.filter_by(member_id='C25').first():
+            db.session.add(Voter(member_id='C25', full_name='Elsewhere', phone_number='0',
+                                 voter_id='ELSEWHERE', voting_token='99999999'))
+            db.session.commit()
+
+    rows = [[f'C{n}', f'Chunked {n}', '076000000'] for n in range(45)]
+    with app.app_context():
+        importer = VoterImporter(commit_every=10, on_progress=concurrent_import).import_rows(rows)
+        assert importer.added == importer.committed == 35
+        assert importer.invalid == 10
+        assert importer.errors[0].startswith('Rows 22-31: database error, 10 rows not saved')
+        assert Voter.query.filter(Voter.member_id.like('C%')).count() == 36
+
+
+def test_encoding_error_late_in_upload_keeps_committed_chunks(app, client, election):
+    from app.models import Voter
+
+    app.config['IMPORT_COMMIT_ROWS'] = 50
+    rows = ''.join(f'E{n:04d},Encoded Member Number {n},+232 76 {n:06d}\n' for n in range(500))
+    body = ('MemberID,FullName,Phone\n' + rows).encode('utf-8') + b'E9999,Bad \xff Byte,076000000\n'
+
+    response = client.post('/admin/upload-voters', headers=ADMIN, content_type='multipart/form-data',
+                           data={'file': (io.BytesIO(body), 'voters.csv')})
+    data = response.get_json()
+    assert data['status'] == 'failed'
+    assert 'encoding' in data['error'] and data['added'] > 0
+    with app.app_context():
+        assert Voter.query.filter(Voter.member_id.like('E%')).count() == data['added']
@@ -0,0 +1,89 @@
+"""EXPLAIN-based checks that every hot query is served by an index."""
+
+import pytest
+from sqlalchemy import func
+
+
+def _plan(statement):
+    from app import db
+
+    sql = str(statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+    return ' | '.join(row[-1] for row in db.session.execute(db.text(f'EXPLAIN QUERY PLAN {sql}')))
+
+
+def _hot_queries():
+    from app import db
+    from app.models import Candidate, CandidateTally, Position, Vote, Voter
+
+    return {
+        'voter login': (
+            db.select(Voter.id).where(Voter.voter_id == 'OBUSLG001', Voter.voting_token == '12345678'),
+            'USING INDEX'),
+        'voted count': (
+            db.select(func.count()).select_from(Voter).where(Voter.has_voted == True),  # noqa: E712
+            'ix_voter_has_voted'),
+        'OBUSLG prefix': (
+            db.select(Voter.voter_id).where(Voter.voter_id >= 'OBUSLG', Voter.voter_id < 'OBUSLH'),
+            'INDEX'),
+        'votes by voter': (
+            db.select(Vote.voter_id).where(Vote.voter_id.in_([1, 2, 3])).distinct(),
+            'uq_vote_voter_position'),
+        'count per candidate': (
+            db.select(Vote.candidate_id, func.count(Vote.id)).group_by(Vote.candidate_id),
+            'ix_vote_candidate_id'),
+        'count per position and candidate': (
+            db.select(func.count(Vote.id)).where(Vote.position_id == 1, Vote.candidate_id == 2),
+            'ix_vote_position_candidate'),
+        'candidates of a position': (
+            db.select(Candidate.id).where(Candidate.position_id == 1),
+            'ix_candidate_position_id'),
+        'results join': (
+            db.select(Position.id, Candidate.id, CandidateTally.votes)
+            .join(Candidate, Candidate.position_id == Position.id)
+            .outerjoin(CandidateTally, CandidateTally.candidate_id == Candidate.id),
+            'ix_candidate_position_id'),
+    }
+
+
+@pytest.mark.parametrize('name', [
+    'voter login', 'voted count', 'OBUSLG prefix', 'votes by voter',
+    'count per candidate', 'count per position and candidate', 'candidates of a position', 'results join',
+])
+def test_hot_query_uses_index(app, name):
+    with app.app_context():
+        statement, expected_index = _hot_queries()[name]
+        plan = _plan(statement)
+    assert expected_index in plan, plan
+
+
+def test_migration_adds_missing_indexes(app):
+    from app import db
+    from app.migrations import apply_index_migration
+
+    with app.app_context():
+        for name in ('ix_vote_candidate_id', 'uq_vote_voter_position', 'ix_voter_has_voted'):
+            db.session.execute(db.text(f'DROP INDEX {name}'))
+        db.session.commit()
+
+        created, skipped = apply_index_migration()
+        assert sorted(created) == ['ix_vote_candidate_id', 'ix_voter_has_voted', 'uq_vote_voter_position']
+        assert skipped == []
+        assert apply_index_migration() == ([], [])
+
+
+def test_migration_skips_unique_index_when_duplicates_exist(app, election):
+    from app import db
+    from app.migrations import apply_index_migration
+    from app.models import Vote, Voter
+
+    with app.app_context():
+        db.session.execute(db.text('DROP INDEX uq_vote_voter_position'))
+        voter = Voter.query.first()
+        president = election['positions']['President']
+        for name in ('President A', 'President B'):
+            db.session.add(Vote(voter_id=voter.id, position_id=president, candidate_id=election['candidates'][name]))
+        db.session.commit()
+
+        created, skipped = apply_index_migration()
+        assert created == []
+        assert skipped == ['uq_vote_voter_position']
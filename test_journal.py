@@ -0,0 +1,147 @@
+"""Tests for the write-behind ballot journal."""
+
+import json
+import os
+
+import pytest
+
+from conftest import cast_ballot
+
+pytest.importorskip('fcntl')
+
+
+@pytest.fixture
+def journal(app, tmp_path):
+    from app.journal import init_journal
+
+    app.config['BALLOT_JOURNAL_DIR'] = str(tmp_path / 'journal')
+    app.config['BALLOT_JOURNAL_FLUSH_INTERVAL'] = 3600
+    journal = init_journal(app)
+    yield journal
+    journal.stop()
+
+
+def test_ballots_reach_the_database_on_flush(app, client, election, journal):
+    from app.models import Vote, Voter
+    from app.tally import tally_counts
+
+    cast_ballot(client, election, 0, {'President': 'President A', 'Secretary': 'Secretary B'})
+    cast_ballot(client, election, 1, {'President': 'President A'})
+
+    with app.app_context():
+        assert Voter.query.filter_by(has_voted=True).count() == 2
+        assert Vote.query.count() == 0
+
+    assert journal.flush() == 2
+
+    with app.app_context():
+        assert Vote.query.count() == 3
+        assert tally_counts()[election['candidates']['President A']] == 2
+    assert os.listdir(journal.directory) == []
+
+
+def test_recovery_replays_unflushed_segments_once(app, client, election, journal):
+    from app import db
+    from app.journal import BallotJournal
+    from app.models import Vote, Voter
+    from app.tally import tally_counts
+
+    cast_ballot(client, election, 0, {'President': 'President B'})
+    journal.flush()
+
+    with app.app_context():
+        voter_ids = [v.id for v in Voter.query.order_by(Voter.id)]
+    president = election['positions']['President']
+    president_a = election['candidates']['President A']
+    president_b = election['candidates']['President B']
+
+    with app.app_context():
+        # The crashed worker committed voter 2's claim but not voter 3's
+        db.session.get(Voter, voter_ids[1]).has_voted = True
+        db.session.commit()
+
+    # A crashed worker's segment: a replayed ballot, an aborted and a retried ballot
+    # for voter 2, a ballot whose claim never committed and a torn line
+    lines = [
+        {'voter_id': voter_ids[0], 'selections': [[president, president_b]], 'timestamp': '2026-01-01T10:00:00'},
+        {'id': 'a', 'voter_id': voter_ids[1], 'selections': [[president, president_a]],
+         'timestamp': '2026-01-01T10:00:01'},
+        {'abort': 'a'},
+        {'id': 'b', 'voter_id': voter_ids[1], 'selections': [[president, president_b]],
+         'timestamp': '2026-01-01T10:00:02'},
+        {'id': 'c', 'voter_id': voter_ids[2], 'selections': [[president, president_a]],
+         'timestamp': '2026-01-01T10:00:03'},
+    ]
+    with open(os.path.join(journal.directory, 'ballots-99999-1-1.log'), 'wb') as f:
+        f.write(b''.join(json.dumps(line).encode() + b'\n' for line in lines) + b'{"voter_id": 3, "sel')
+
+    assert BallotJournal(app, journal.directory).recover() == 1
+    assert BallotJournal(app, journal.directory).recover() == 0
+
+    with app.app_context():
+        assert Vote.query.count() == 2
+        assert tally_counts()[president_b] == 2
+        assert tally_counts().get(president_a, 0) == 0
+        assert not db.session.get(Voter, voter_ids[2]).has_voted
+
+
+def test_failed_commit_aborts_the_entry_and_a_retry_wins(app, client, election, journal, monkeypatch):
+    from app import db
+    from app.models import Vote
+    from app.tally import tally_counts
+
+    real_commit = db.session.commit
+    calls = []
+
+    def fail_once():
+        calls.append(1)
+        if len(calls) == 1:
+            db.session.rollback()
+            raise RuntimeError('connection lost')
+        real_commit()
+
+    monkeypatch.setattr(db.session, 'commit', fail_once)
+    with pytest.raises(RuntimeError):
+        cast_ballot(client, election, 0, {'President': 'President A'})
+    monkeypatch.undo()
+    cast_ballot(client, election, 0, {'President': 'President B'})
+
+    assert journal.flush() == 1
+    with app.app_context():
+        assert Vote.query.count() == 1
+        counts = tally_counts()
+        assert counts[election['candidates']['President B']] == 1
+        assert counts.get(election['candidates']['President A'], 0) == 0
+
+
+def test_failed_append_writes_the_ballot_with_the_claim(app, client, election, journal, monkeypatch):
+    from app.models import Vote, Voter
+
+    def fail(*args, **kwargs):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(journal, 'append', fail)
+    cast_ballot(client, election, 0, {'President': 'President A'})
+
+    with app.app_context():
+        assert Voter.query.filter_by(has_voted=True).count() == 1
+        assert Vote.query.count() == 1
+    assert os.listdir(journal.directory) == []
+
+
+def test_flush_waits_for_undecided_claims(app, election, journal):
+    from app import db
+    from app.ballot import claim_voter
+    from app.models import Vote, Voter
+
+    with app.app_context():
+        voter = Voter.query.order_by(Voter.id).first()
+        president = election['positions']['President']
+        entry = journal.append(voter.id, [(president, election['candidates']['President A'])])
+        assert journal.flush() == 0  # the claim is not committed yet
+        assert claim_voter(voter.id)
+        db.session.commit()
+        journal.finish(entry, committed=True)
+        assert journal.flush() == 1
+        assert Vote.query.count() == 1
+    assert os.listdir(journal.directory) == []
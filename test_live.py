@@ -0,0 +1,149 @@
+"""Tests for the live results stream."""
+
+import json
+
+from conftest import cast_ballot
+
+
+def _data(message):
+    event, data = message.strip().split('\n')
+    return event[len('event: '):], json.loads(data[len('data: '):])
+
+
+def test_stream_starts_with_snapshot(client, election):
+    response = client.get('/dashboard/stream', buffered=False)
+    assert response.mimetype == 'text/event-stream'
+    chunks = iter(response.response)
+    assert next(chunks).startswith(b'retry:')
+    event, data = _data(next(chunks).decode())
+    response.close()
+
+    assert event == 'results'
+    assert data['total_voters'] == 3
+    assert [p['name'] for p in data['positions']] == ['President', 'Secretary']
+
+
+def test_one_read_fans_out_deltas_to_all_watchers(app, client, election):
+    from app.live import results_broadcaster
+
+    app.config['LIVE_POLL_INTERVAL'] = 0.05
+    broadcaster = results_broadcaster(app)
+    broadcaster.snapshot()
+
+    loads = []
+    load = broadcaster.load
+    broadcaster.load = lambda: loads.append(1) or load()
+    watchers = [broadcaster.subscribe() for _ in range(50)]
+
+    cast_ballot(client, election, 0, {'President': 'President A'})
+    messages = [q.get(timeout=5) for q in watchers]
+
+    event, delta = _data(messages[0])
+    assert event == 'results'
+    assert delta['voted_count'] == 1
+    assert delta['votes'] == {str(election['candidates']['President A']): 1}
+    assert all(m == messages[0] for m in messages)
+    assert len(loads) == 1
+
+    for q in watchers:
+        broadcaster.unsubscribe(q)
+
+
+def test_candidate_change_sends_full_snapshot(app, client, election):
+    from app.results import results_delta
+
+    with app.app_context():
+        from app.results import election_results
+        before = election_results().to_dict()
+
+    client.post('/admin/candidates', json={'name': 'Late Entrant', 'position_id': election['positions']['President']},
+                headers={'Authorization': 'Bearer admin-token'})
+
+    with app.app_context():
+        after = election_results().to_dict()
+    assert results_delta(before, after)['full'] is True
+
+
+def test_voting_status_stream_pushes_open_and_close(app, client, election):
+    from app.live import voting_state_broadcaster
+
+    app.config['LIVE_POLL_INTERVAL'] = 60  # only voting_control's notify() can deliver in time
+    assert client.get('/admin/voting-status/stream').status_code == 401
+    response = client.get('/admin/voting-status/stream?token=admin-token', buffered=False)
+    chunks = iter(response.response)
+    next(chunks)
+    assert _data(next(chunks).decode()) == ('voting', {'voting_open': True, 'voting_until': None})
+    response.close()
+
+    broadcaster = voting_state_broadcaster(app)
+    watcher = broadcaster.subscribe()
+    auth = {'Authorization': 'Bearer admin-token'}
+
+    client.post('/admin/voting-control', json={'action': 'close'}, headers=auth)
+    assert _data(watcher.get(timeout=5)) == ('voting', {'voting_open': False, 'voting_until': None})
+    client.post('/admin/voting-control', json={'action': 'open', 'minutes': 30}, headers=auth)
+    event, data = _data(watcher.get(timeout=5))
+    assert data['voting_open'] is True and data['voting_until']
+    broadcaster.unsubscribe(watcher)
+
+
+def test_voting_status_checks_do_not_query_database(app, election):
+    from app import db
+    from app.live import voting_state_broadcaster
+    from app.querycount import count_queries
+
+    broadcaster = voting_state_broadcaster(app)
+    broadcaster.snapshot()
+    with app.app_context(), count_queries(db.engine) as queries:
+        for _ in range(100):
+            assert broadcaster._refresh() is None
+    assert queries.count == 0
+
+
+def test_streams_are_capped_per_worker(app, client, election):
+    app.config['LIVE_MAX_STREAMS'] = 1
+
+    first = client.get('/dashboard/stream', buffered=False)
+    assert first.status_code == 200
+    refused = client.get('/admin/voting-status/stream?token=admin-token')
+    assert refused.status_code == 503 and refused.headers['Retry-After']
+    # Refused pages poll the ETag endpoint instead
+    assert client.get('/api/results').status_code == 200
+
+    first.close()
+    again = client.get('/dashboard/stream', buffered=False)
+    assert again.status_code == 200
+    again.close()
+
+
+def test_voting_status_long_poll_returns_on_change(app, client, election):
+    import threading
+    import time
+
+    app.config['LIVE_POLL_INTERVAL'] = 60  # only voting_control's notify() can wake the poll in time
+    etag = client.get('/admin/voting-status').headers['ETag']
+
+    # Unchanged: held for the whole wait, then 304
+    started = time.monotonic()
+    assert client.get('/admin/voting-status?wait=1', headers={'If-None-Match': etag}).status_code == 304
+    assert time.monotonic() - started >= 0.9
+
+    closer = threading.Timer(0.3, lambda: app.test_client().post(
+        '/admin/voting-control', json={'action': 'close'}, headers={'Authorization': 'Bearer admin-token'}))
+    closer.start()
+    started = time.monotonic()
+    response = client.get('/admin/voting-status?wait=20', headers={'If-None-Match': etag})
+    closer.join()
+    assert response.status_code == 200 and response.get_json()['voting_open'] is False
+    assert time.monotonic() - started < 10
+
+
+def test_voting_status_long_poll_falls_back_when_slots_are_full(app, client, election):
+    app.config['LIVE_MAX_STREAMS'] = 1
+    etag = client.get('/admin/voting-status').headers['ETag']
+
+    stream = client.get('/dashboard/stream', buffered=False)
+    response = client.get('/admin/voting-status?wait=20', headers={'If-None-Match': etag})
+    stream.close()
+    assert response.status_code == 304
+    assert response.headers['Retry-After'] == '60'
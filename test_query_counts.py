@@ -0,0 +1,62 @@
+"""Query-count harness: admin read paths must not issue a query per row."""
+
+import pytest
+
+ADMIN = {'Authorization': 'Bearer admin-token'}
+
+# (path, headers, query budget)
+ENDPOINTS = [
+    ('/admin/?token=admin-token', {}, 4),   # results (2) + positions + candidates IN
+    ('/admin/debug', {}, 4),
+    ('/admin/positions', ADMIN, 1),
+    ('/admin/candidates', ADMIN, 1),
+    ('/admin/check-positions', ADMIN, 1),
+    ('/dashboard', {}, 2),
+    ('/api/results', {}, 2),
+]
+
+
+def _add_positions(count, candidates_each):
+    from app import db
+    from app.models import Candidate, Position
+    from app.tally import ensure_tally
+
+    for _ in range(count):
+        position = Position(name=f'Extra {Position.query.count() + 1}', voting_enabled=True)
+        db.session.add(position)
+        db.session.flush()
+        for c in range(candidates_each):
+            candidate = Candidate(name=f'{position.name} {c}', position_id=position.id)
+            db.session.add(candidate)
+            db.session.flush()
+            ensure_tally(candidate.id)
+    db.session.commit()
+
+
+def _queries(app, client, path, headers):
+    from app import db
+    from app.querycount import count_queries
+
+    with app.app_context():
+        with count_queries(db.engine) as counter:
+            response = client.get(path, headers=headers)
+    assert response.status_code == 200
+    return counter.count
+
+
+@pytest.mark.parametrize('path,headers,budget', ENDPOINTS)
+def test_query_count_does_not_grow_with_positions(app, client, election, path, headers, budget):
+    # Each request starts cold: results and rendered fragments are cached per version
+    from app.results import bump_results_version
+
+    with app.app_context():
+        bump_results_version()
+    before = _queries(app, client, path, headers)
+    assert before <= budget
+
+    with app.app_context():
+        _add_positions(5, 4)
+        bump_results_version()
+    after = _queries(app, client, path, headers)
+
+    assert after == before
@@ -0,0 +1,48 @@
+"""Tests for the vote attempt rate limiters."""
+
+import pytest
+
+from app.ratelimit import MemoryRateLimiter, SQLiteRateLimiter
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def make_limiter(request, tmp_path):
+    def make(attempts=3, window=60, max_keys=100):
+        if request.param == 'memory':
+            return MemoryRateLimiter(attempts, window, max_keys=max_keys)
+        return SQLiteRateLimiter(str(tmp_path / 'rl.db'), attempts, window, max_keys=max_keys)
+    return make
+
+
+def test_limits_and_refills(make_limiter):
+    limiter = make_limiter(attempts=3, window=60)
+    assert [limiter.hit('1.2.3.4', now=1000.0) for _ in range(4)] == [True, True, True, False]
+    assert limiter.hit('5.6.7.8', now=1000.0) is True
+    # One token refills every 20 seconds
+    assert limiter.hit('1.2.3.4', now=1020.5) is True
+    assert limiter.hit('1.2.3.4', now=1020.5) is False
+
+
+def test_memory_is_bounded(make_limiter):
+    limiter = make_limiter(max_keys=50)
+    for n in range(1000):
+        limiter.hit(f'10.0.{n // 256}.{n % 256}', now=1000.0)
+    assert len(limiter) <= 50
+
+
+def test_sqlite_backend_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / 'shared.db')
+    worker_a = SQLiteRateLimiter(path, 2, 60)
+    worker_b = SQLiteRateLimiter(path, 2, 60)
+    assert worker_a.hit('1.2.3.4', now=1000.0) is True
+    assert worker_b.hit('1.2.3.4', now=1000.0) is True
+    assert worker_a.hit('1.2.3.4', now=1000.0) is False
+
+
+def test_vote_post_is_rate_limited(client, election):
+    voter_id, _ = election['voters'][0]
+    for _ in range(10):
+        client.post('/vote', data={'voter_id': voter_id, 'voting_token': '99999999'})
+    response = client.post('/vote', data={'voter_id': voter_id, 'voting_token': '99999999'},
+                           follow_redirects=True)
+    assert b'Too many voting attempts' in response.data
@@ -0,0 +1,80 @@
+"""Tests for the keyset-paginated voter registry API."""
+
+import base64
+
+import pytest
+
+from conftest import cast_ballot
+
+ADMIN = {'Authorization': 'Bearer admin-token'}
+
+
+@pytest.fixture
+def registry(app, election):
+    from app import db
+    from app.models import Voter
+
+    with app.app_context():
+        # Duplicate names exercise the id tie-breaker
+        for n in range(4, 31):
+            db.session.add(Voter(member_id=f'M{n:03d}', full_name=f'Member {n % 5}', phone_number='0',
+                                 voter_id=f'OBUSLG{n:03d}', voting_token=f'{n:08d}'))
+        db.session.commit()
+    return election
+
+
+def _walk(client, **params):
+    rows, cursor, pages = [], None, 0
+    while True:
+        query = dict(params, limit=7, **({'cursor': cursor} if cursor else {}))
+        data = client.get('/admin/voters', query_string=query, headers=ADMIN).get_json()
+        rows += data['voters']
+        pages += 1
+        cursor = data['next_cursor']
+        if cursor is None:
+            return rows, pages
+
+
+@pytest.mark.parametrize('sort,order', [('id', 'asc'), ('full_name', 'asc'), ('full_name', 'desc'), ('voter_id', 'asc')])
+def test_pages_cover_registry_in_order(client, registry, sort, order):
+    rows, pages = _walk(client, sort=sort, order=order)
+    assert len(rows) == 30 and pages == 5
+    expected = sorted(rows, key=lambda v: (v[sort], v['id']), reverse=order == 'desc')
+    assert [v['id'] for v in rows] == [v['id'] for v in expected]
+
+
+def test_has_voted_filter(client, registry):
+    cast_ballot(client, registry, 1, {'President': 'President A'})
+
+    voted, _ = _walk(client, has_voted='true')
+    not_voted, _ = _walk(client, has_voted='false')
+    assert [v['voter_id'] for v in voted] == [registry['voters'][1][0]]
+    assert len(not_voted) == 29 and not any(v['has_voted'] for v in not_voted)
+
+
+def test_bad_requests(client, registry):
+    assert client.get('/admin/voters').status_code == 401
+    assert client.get('/admin/voters?sort=phone_number', headers=ADMIN).status_code == 400
+    assert client.get('/admin/voters?cursor=garbage', headers=ADMIN).status_code == 400
+    cursor = client.get('/admin/voters?limit=2', headers=ADMIN).get_json()['next_cursor']
+    assert client.get(f'/admin/voters?sort=full_name&cursor={cursor}', headers=ADMIN).status_code == 400
+
+
+def test_wrong_typed_cursor_is_rejected(client, registry):
+    from app.registry import encode_cursor
+
+    for sort, key, last_id in [('id', 'x', 'y'), ('id', 5, [1]), ('full_name', {'a': 1}, 3),
+                               ('full_name', 'Ann', True), (['id'], 1, 1)]:
+        cursor = encode_cursor(sort, 'asc', key, last_id)
+        response = client.get(f'/admin/voters?sort=full_name&cursor={cursor}', headers=ADMIN)
+        assert response.status_code == 400
+        assert response.get_json()['error'] == 'Invalid cursor'
+    # A dict with four keys unpacks into four values too
+    cursor = base64.urlsafe_b64encode(b'{"id":1,"asc":2,"k":3,"v":4}').decode().rstrip('=')
+    assert client.get(f'/admin/voters?cursor={cursor}', headers=ADMIN).status_code == 400
+
+
+def test_admin_dashboard_does_not_render_voters(client, registry):
+    html = client.get('/admin/?token=admin-token').get_data(as_text=True)
+    assert 'voterTableBody' in html
+    assert '00000017' not in html
@@ -0,0 +1,69 @@
+"""Tests for the shared results aggregation."""
+
+from conftest import cast_ballot
+
+
+def test_results_structure_and_turnout(app, client, election):
+    from app.results import election_results
+
+    cast_ballot(client, election, 0, {'President': 'President A', 'Secretary': 'Secretary B'})
+    cast_ballot(client, election, 1, {'President': 'President B'})
+
+    with app.app_context():
+        results = election_results()
+
+    assert results.total_voters == 3
+    assert results.voted_count == 2
+    assert round(results.turnout, 1) == 66.7
+    assert results.position_results() == {
+        'President': {'President A': 1, 'President B': 1},
+        'Secretary': {'Secretary A': 0, 'Secretary B': 1},
+    }
+
+
+def test_results_query_count_is_constant(app, client, election):
+    from app import db
+    from app.models import Candidate
+    from app.querycount import count_queries
+    from app.results import election_results
+    from app.tally import ensure_tally
+
+    with app.app_context():
+        with count_queries(db.engine) as small:
+            election_results()
+
+        for n in range(20):
+            cand = Candidate(name=f'Extra {n}', position_id=election['positions']['President'])
+            db.session.add(cand)
+            db.session.flush()
+            ensure_tally(cand.id)
+        db.session.commit()
+
+    cast_ballot(client, election, 2, {'President': 'President A'})
+
+    with app.app_context():
+        with count_queries(db.engine) as large:
+            results = election_results()
+
+    assert large.count == small.count == 2
+    assert len(results.positions[0].candidates) == 22
+
+
+def test_dashboard_and_export_render_results(client, election):
+    cast_ballot(client, election, 0, {'President': 'President A'})
+
+    page = client.get('/dashboard')
+    assert page.status_code == 200
+    assert b'President A' in page.data
+
+    export = client.get('/admin/export-results', headers={'Authorization': 'Bearer admin-token'})
+    assert export.status_code == 200
+    assert b'President,President A,1' in export.data
+
+
+def test_admin_dashboard_renders_results(client, election):
+    cast_ballot(client, election, 0, {'Secretary': 'Secretary A'})
+
+    page = client.get('/admin/?token=admin-token')
+    assert page.status_code == 200
+    assert b'Secretary A' in page.data
@@ -0,0 +1,88 @@
+"""Tests for the in-memory voter search index."""
+
+import io
+
+import pytest
+
+ADMIN = {'Authorization': 'Bearer admin-token'}
+
+
+@pytest.fixture
+def members(app, election):
+    from app import db
+    from app.models import Voter
+
+    people = [('M100', 'John Smith', '+232 76 123 456'), ('M101', 'Joan Smythe', '+232 77 555 010'),
+              ('M102', "Patrick O'Brien", '+232 30 987 654'), ('M103', 'Fatmata Kamara', '+232 88 222 333')]
+    with app.app_context():
+        for n, (member_id, name, phone) in enumerate(people, start=100):
+            db.session.add(Voter(member_id=member_id, full_name=name, phone_number=phone,
+                                 voter_id=f'OBUSLG{n}', voting_token=f'{n:08d}'))
+        db.session.commit()
+    return election
+
+
+def _search(client, q):
+    response = client.get('/admin/voters/search', query_string={'q': q}, headers=ADMIN)
+    assert response.status_code == 200
+    return [v['full_name'] for v in response.get_json()['voters']]
+
+
+@pytest.mark.parametrize('query,expected', [
+    ('jonh smith', 'John Smith'),       # transposed letters
+    ('Kamarra', 'Fatmata Kamara'),      # extra letter
+    ('obrien', "Patrick O'Brien"),      # punctuation
+    ('m102', "Patrick O'Brien"),        # member ID
+    ('OBUSLG103', 'Fatmata Kamara'),    # voter ID
+    ('076 123 456', 'John Smith'),      # phone, formatted differently
+])
+def test_typo_tolerant_lookup(client, members, query, expected):
+    assert _search(client, query)[0] == expected
+
+
+def test_index_catches_up_on_import_and_rebuilds_on_clear(app, client, members):
+    assert _search(client, 'Adama Sesay') == []
+    csv_data = b'MemberID,FullName,Phone\nM200,Adama Sesay,+232 79 000 111\n'
+    client.post('/admin/upload-voters', headers=ADMIN,
+                data={'file': (io.BytesIO(csv_data), 'voters.csv')}, content_type='multipart/form-data')
+    assert _search(client, 'Adama Sesay')[0] == 'Adama Sesay'
+
+    client.post('/admin/clear-voters', headers=ADMIN)
+    assert _search(client, 'Adama Sesay') == []
+
+
+def test_search_requires_admin_and_query(client, members):
+    assert client.get('/admin/voters/search?q=john').status_code == 401
+    assert client.get('/admin/voters/search', headers=ADMIN).status_code == 400
+
+
+def test_readding_a_voter_replaces_its_entry():
+    from app.search import VoterSearchIndex
+
+    index = VoterSearchIndex()
+    index.add(1, 'M1', 'Alpha Bangura', 'OBUSLG001', '076000001')
+    index.add(1, 'M1', 'Alpha Conteh', 'OBUSLG001', '076000001')
+    assert index.search('bangura') == []
+    assert [pk for pk, _ in index.search('conteh')] == [1]
+    assert len(index) == 1
+
+
+def test_catch_up_swaps_in_a_copy(app, members):
+    from app import db
+    from app.models import Voter
+    from app.search import get_voter_index, voters_imported
+
+    with app.app_context():
+        before = get_voter_index()
+        before.search('john')  # builds the lazy prefix list that the copy shares
+        db.session.add(Voter(member_id='M300', full_name='Isatu Jalloh', phone_number='076300300',
+                             voter_id='OBUSLG300', voting_token='00000300'))
+        db.session.commit()
+        voters_imported()
+
+        after = get_voter_index()
+        assert after is not before
+        # Searches still running on the published index never see it change
+        assert before.search('jalloh') == [] and len(before) == len(after) - 1
+        assert [pk for pk, _ in after.search('jalloh')] == [Voter.query.filter_by(member_id='M300').one().id]
+        assert after.search('jonh smith') == before.search('jonh smith')
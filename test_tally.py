@@ -0,0 +1,61 @@
+"""Tests for the incrementally maintained candidate tallies."""
+
+from conftest import cast_ballot
+
+
+def test_ballot_updates_tallies(app, client, election):
+    from app.tally import tally_counts
+
+    cast_ballot(client, election, 0, {'President': 'President A', 'Secretary': 'Secretary B'})
+    cast_ballot(client, election, 1, {'President': 'President A'})
+
+    with app.app_context():
+        counts = tally_counts()
+
+    candidates = election['candidates']
+    assert counts[candidates['President A']] == 2
+    assert counts[candidates['President B']] == 0
+    assert counts[candidates['Secretary B']] == 1
+
+
+def test_rebuild_matches_vote_table(app, client, election):
+    from app import db
+    from app.models import CandidateTally
+    from app.tally import rebuild_tallies, tally_counts
+
+    cast_ballot(client, election, 0, {'President': 'President B', 'Secretary': 'Secretary A'})
+
+    with app.app_context():
+        before = tally_counts()
+        CandidateTally.query.delete()
+        db.session.commit()
+        rebuild_tallies()
+        db.session.commit()
+        assert tally_counts() == before
+
+
+def test_rejected_ballot_leaves_tallies_untouched(app, client, election):
+    from app.tally import tally_counts
+
+    cast_ballot(client, election, 0, {'President': 'President A'})
+    cast_ballot(client, election, 0, {'President': 'President A'})  # already voted
+
+    with app.app_context():
+        assert tally_counts()[election['candidates']['President A']] == 1
+
+
+def test_missing_tally_insert_adds_to_a_concurrently_created_row(app, election):
+    from app import db
+    from app.models import CandidateTally
+    from app.tally import _insert_tallies, increment_tallies, tally_counts
+
+    president_a = election['candidates']['President A']
+    with app.app_context():
+        CandidateTally.query.filter_by(candidate_id=president_a).delete()
+        db.session.commit()
+        increment_tallies([president_a])  # row missing: inserted
+        db.session.commit()
+        # A second ballot that also saw the row missing must not hit the primary key
+        _insert_tallies({president_a: 1})
+        db.session.commit()
+        assert tally_counts()[president_a] == 2
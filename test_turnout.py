@@ -0,0 +1,63 @@
+"""Tests for the per-minute turnout rollup."""
+
+from datetime import datetime
+
+from conftest import cast_ballot
+
+
+def test_ballots_fill_the_rollup(app, client, election):
+    from app.turnout import turnout_series
+
+    cast_ballot(client, election, 0, {'President': 'President A', 'Secretary': 'Secretary B'})
+    cast_ballot(client, election, 1, {'President': 'President B'})
+    cast_ballot(client, election, 1, {'President': 'President B'})  # already voted
+
+    with app.app_context():
+        series = turnout_series()
+
+    assert sum(ballots for _, ballots in series) == 2
+    assert all(minute.second == 0 and minute.microsecond == 0 for minute, _ in series)
+
+
+def test_rollup_upserts_existing_minutes(app):
+    from app import db
+    from app.turnout import add_to_turnout, turnout_series
+
+    minute = datetime(2026, 3, 1, 9, 30)
+    with app.app_context():
+        add_to_turnout({minute.replace(second=5): 2})
+        add_to_turnout({minute.replace(second=50): 3, datetime(2026, 3, 1, 9, 31): 1})
+        db.session.commit()
+        assert turnout_series() == [(minute, 5), (datetime(2026, 3, 1, 9, 31), 1)]
+
+
+def test_rebuild_matches_incremental_rollup(app, client, election):
+    from app import db
+    from app.models import TurnoutMinute
+    from app.turnout import backfill_turnout_if_needed, turnout_series
+
+    cast_ballot(client, election, 0, {'President': 'President A', 'Secretary': 'Secretary A'})
+    cast_ballot(client, election, 2, {'Secretary': 'Secretary B'})
+
+    with app.app_context():
+        before = turnout_series()
+        TurnoutMinute.query.delete()
+        db.session.commit()
+        assert backfill_turnout_if_needed() == len(before)
+        assert turnout_series() == before
+        assert backfill_turnout_if_needed() == 0
+
+
+def test_turnout_api_reads_rollup_with_etag(client, election):
+    cast_ballot(client, election, 0, {'President': 'President A'})
+
+    response = client.get('/api/turnout')
+    data = response.get_json()
+    assert data['total_voters'] == 3
+    assert data['series'][-1]['cumulative'] == 1
+    assert data['series'][0]['minute'].endswith(':00Z')
+
+    assert client.get('/api/turnout', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+    cast_ballot(client, election, 1, {'President': 'President B'})
+    assert client.get('/api/turnout', headers={'If-None-Match': response.headers['ETag']}).status_code == 200
+
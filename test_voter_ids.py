@@ -0,0 +1,81 @@
+"""Tests for the database-backed OBUSLG voter ID counter."""
+
+import io
+import threading
+
+ADMIN = {'Authorization': 'Bearer admin-token'}
+
+
+def test_blocks_are_contiguous_and_never_reused(app):
+    from app import db
+    from app.voter_ids import VoterNumberSequence
+
+    with app.app_context():
+        sequence = VoterNumberSequence()
+        assert sequence.reserve(5) == [1, 2, 3, 4, 5]
+        db.session.rollback()  # an uncommitted block is given out again
+        assert sequence.reserve(5) == [1, 2, 3, 4, 5]
+        db.session.commit()
+        assert sequence.reserve(3) == [6, 7, 8]
+        db.session.commit()
+
+
+def test_concurrent_workers_get_disjoint_blocks(app):
+    from app import db
+    from app.voter_ids import VoterNumberSequence
+
+    numbers, errors = [], []
+
+    def worker():
+        try:
+            with app.app_context():
+                for _ in range(20):
+                    numbers.extend(VoterNumberSequence().reserve(10))
+                    db.session.commit()
+                db.session.remove()
+        except Exception as e:  # surfaced by the assertion below
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert sorted(numbers) == list(range(1, 401))
+
+
+def test_startup_sync_and_skipping_ids_set_directly(app, client, election):
+    from app import db
+    from app.models import Voter
+    from app.voter_ids import VoterNumberSequence, sync_voter_number_counter
+
+    # The election fixture inserted OBUSLG001-003 behind the counter's back
+    with app.app_context():
+        assert sync_voter_number_counter() == 3
+        assert VoterNumberSequence().reserve(1) == [4]
+        db.session.commit()
+
+    # A member ID shaped like a future number is reused as-is and then skipped
+    csv_data = b'MemberID,FullName,Phone\nOBUSLG005,Direct,076000001\nOBUSLG001,Id Is Taken,076000002\n'
+    client.post('/admin/upload-voters', headers=ADMIN, content_type='multipart/form-data',
+                data={'file': (io.BytesIO(csv_data), 'voters.csv')})
+    with app.app_context():
+        voter_ids = {v.member_id: v.voter_id for v in Voter.query}
+        assert voter_ids['OBUSLG005'] == 'OBUSLG005'
+        assert voter_ids['OBUSLG001'] == 'OBUSLG006'
+
+        voter = Voter(member_id='OBUSLG006')
+        assert voter.generate_voter_id() == 'OBUSLG007'
+
+
+def test_clearing_voters_restarts_numbering(app, client, election):
+    from app import db
+    from app.voter_ids import VoterNumberSequence
+
+    with app.app_context():
+        VoterNumberSequence().reserve(50)
+        db.session.commit()
+    client.post('/admin/clear-voters', headers=ADMIN)
+    with app.app_context():
+        assert VoterNumberSequence().reserve(1) == [1]
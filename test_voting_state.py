@@ -0,0 +1,72 @@
+"""Tests for the cached voting-state snapshot."""
+
+from datetime import datetime, timedelta
+
+ADMIN = {'Authorization': 'Bearer admin-token'}
+
+
+def test_status_served_without_queries_once_cached(app, client, election):
+    from app import db
+    from app.querycount import count_queries
+
+    assert client.get('/admin/voting-status').get_json()['voting_open'] is True
+
+    with app.app_context():
+        with count_queries(db.engine) as counter:
+            for _ in range(5):
+                assert client.get('/admin/voting-status').get_json()['voting_open'] is True
+    assert counter.count == 0
+
+
+def test_voting_control_invalidates_cache(client, election):
+    assert client.get('/admin/voting-status').get_json()['voting_open'] is True
+
+    client.post('/admin/voting-control', json={'action': 'close'}, headers=ADMIN)
+    assert client.get('/admin/voting-status').get_json()['voting_open'] is False
+
+    client.post('/admin/voting-control', json={'action': 'open', 'minutes': 30}, headers=ADMIN)
+    status = client.get('/admin/voting-status').get_json()
+    assert status['voting_open'] is True
+    assert status['voting_until'] is not None
+
+
+def test_other_worker_sees_change_via_version(app, client, election):
+    from app import create_app
+    from app.voting_state import get_voting_state
+
+    other = create_app()
+    other.config['VERSIONS_DIR'] = app.config['VERSIONS_DIR']
+    other.config['VOTING_STATE_TTL'] = 3600
+    with other.app_context():
+        assert get_voting_state().is_open is True
+
+    client.post('/admin/voting-control', json={'action': 'close'}, headers=ADMIN)
+
+    with other.app_context():
+        assert get_voting_state().is_open is False
+
+
+def test_expired_deadline_auto_closes(app, client, election):
+    from app import db
+    from app.models import Setting
+
+    with app.app_context():
+        past = (datetime.utcnow() - timedelta(minutes=1)).isoformat()
+        db.session.add(Setting(key='voting_until', value=past))
+        db.session.commit()
+
+    assert client.get('/vote').status_code == 403
+
+    with app.app_context():
+        assert Setting.query.filter_by(key='voting_open').first().value == 'false'
+        assert Setting.query.filter_by(key='voting_until').first() is None
+
+
+def test_voting_status_poll_answers_304_until_it_changes(client, election):
+    first = client.get('/admin/voting-status')
+    etag = first.headers['ETag']
+    assert client.get('/admin/voting-status', headers={'If-None-Match': etag}).status_code == 304
+
+    client.post('/admin/voting-control', json={'action': 'close'}, headers=ADMIN)
+    changed = client.get('/admin/voting-status', headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and changed.get_json()['voting_open'] is False